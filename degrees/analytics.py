@@ -0,0 +1,60 @@
+from collections import Counter
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from graph import UNREACHED, bfs_distances, encode_snapshot, read_snapshot
+
+# Graph attached by each worker process
+worker_graph = None
+
+
+def seed_statistics(graph, sources, processes=None):
+    """
+    Runs a full breadth-first search from every person index in `sources`
+    and returns a summary of each, in the same order.
+
+    The searches are spread over a pool of `processes` workers. The graph
+    is copied once into shared memory in snapshot form, and every worker
+    reads it from there instead of receiving its own copy.
+    """
+    data = encode_snapshot(graph)
+    shared = SharedMemory(create=True, size=len(data))
+    try:
+        shared.buf[:len(data)] = data
+        del data
+        with Pool(processes, initializer=attach_graph, initargs=(shared.name,)) as pool:
+            return pool.map(summarize_source, sources, chunksize=1)
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def attach_graph(name):
+    """
+    Opens the shared graph in a worker process.
+    """
+    global worker_graph
+    shared = SharedMemory(name=name)
+    worker_graph = read_snapshot(shared.buf)
+
+    # Keeps the segment open for as long as the graph uses it
+    worker_graph.shared = shared
+
+
+def summarize_source(source):
+    return distance_summary(worker_graph, source)
+
+
+def distance_summary(graph, source):
+    """
+    Returns the distance histogram, eccentricity and number of people
+    reached from person index `source`.
+    """
+    histogram = Counter(bfs_distances(graph, source))
+    unreached = histogram.pop(UNREACHED, 0)
+    return {
+        "histogram": dict(sorted(histogram.items())),
+        "eccentricity": max(histogram),
+        "reached": graph.person_count() - unreached,
+        "unreached": unreached
+    }
@@ -0,0 +1,176 @@
+import argparse
+import csv
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+import degrees
+from landmarks import astar_search, build_landmarks
+from util import SearchStats
+
+STRATEGIES = ["bfs", "bidirectional", "compact", "astar"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time degrees searches on a synthetic dataset."
+    )
+    parser.add_argument("directory",
+                        help="where the synthetic CSV files are written")
+    parser.add_argument("--people", type=int, default=10000)
+    parser.add_argument("--movies", type=int, default=3000)
+    parser.add_argument("--cast", type=int, default=5,
+                        help="stars per movie")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Zipf exponent of how often each person is cast")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES,
+                        default=STRATEGIES)
+    args = parser.parse_args()
+
+    print("Generating data...")
+    generate_dataset(
+        args.directory, args.people, args.movies, args.cast, args.skew, args.seed
+    )
+
+    print(f"{'strategy':<14} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'expanded':>10} {'frontier':>10} {'peak KiB':>10}")
+    for strategy in args.strategies:
+        result = run_strategy(args.directory, strategy, args.queries, args.seed)
+        print(f"{strategy:<14} {result['p50'] * 1000:>9.3f} {result['p95'] * 1000:>9.3f} "
+              f"{result['expansions']:>10.1f} {result['frontier_peak']:>10} "
+              f"{result['memory'] / 1024:>10.1f}")
+
+
+def generate_dataset(directory, people, movies, cast, skew=1.0, seed=0):
+    """
+    Write people.csv, movies.csv and stars.csv for a random dataset
+    to `directory`.
+
+    Every movie gets `cast` distinct stars. The chance of casting the
+    person ranked `r` is proportional to 1 / r ** `skew`, so a few
+    people star in many movies and most in only a few.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(people):
+            writer.writerow([person + 1, f"Person {person + 1}", rng.randint(1900, 2005)])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie in range(movies):
+            writer.writerow([movie + 1, f"Movie {movie + 1}", rng.randint(1920, 2020)])
+
+    # Ranks people by popularity in a random order of ids
+    order = list(range(people))
+    rng.shuffle(order)
+    cumulative = []
+    total = 0
+    for rank in range(people):
+        total += 1 / (rank + 1) ** skew
+        cumulative.append(total)
+
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(movies):
+            stars = set()
+            while len(stars) < min(cast, people):
+                rank = rng.choices(range(people), cum_weights=cumulative)[0]
+                stars.add(order[rank])
+            for person in stars:
+                writer.writerow([person + 1, movie + 1])
+
+
+def run_strategy(directory, strategy, queries, seed=0):
+    """
+    Loads the data in `directory` the way `strategy` needs, answers
+    `queries` random pairs and returns latency percentiles, mean people
+    expanded, the largest frontier seen and the peak memory traced
+    during a single query.
+    """
+    search = prepare(directory, strategy)
+    rng = random.Random(seed)
+
+    # People in no movie are trivially unreachable, so they are not queried
+    person_ids = sorted(
+        person_id for person_id, person in degrees.people.items()
+        if person["movies"]
+    )
+    pairs = [rng.sample(person_ids, 2) for _ in range(queries)]
+
+    latencies = []
+    expansions = []
+    frontier_peak = 0
+    for source, target in pairs:
+        stats = SearchStats()
+        start = time.perf_counter()
+        search(source, target, stats)
+        latencies.append(time.perf_counter() - start)
+        expansions.append(stats.expansions)
+        frontier_peak = max(frontier_peak, stats.frontier_peak)
+
+    # Memory is traced in a second pass so tracing does not skew the timings
+    memory = 0
+    tracemalloc.start()
+    for source, target in pairs:
+        tracemalloc.reset_peak()
+        search(source, target, None)
+        memory = max(memory, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "expansions": statistics.mean(expansions),
+        "frontier_peak": frontier_peak,
+        "memory": memory
+    }
+
+
+def prepare(directory, strategy):
+    """
+    Loads the data for `strategy` and returns a function
+    search(source, target, stats) that runs it.
+    """
+    if strategy in ("bfs", "bidirectional"):
+        degrees.load_data(directory)
+        if strategy == "bfs":
+            return degrees.shortest_path
+        return degrees.bidirectional_path
+
+    degrees.load_data(directory, compact=True)
+    if strategy == "compact":
+        return degrees.bidirectional_path
+
+    graph = degrees.graph
+    index = build_landmarks(graph)
+
+    def search(source, target, stats):
+        return astar_search(
+            graph, index, graph.person_index(source), graph.person_index(target), stats
+        )
+    return search
+
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of sorted `values`.
+    """
+    if not values:
+        return 0
+    rank = max(0, -(-len(values) * percent // 100) - 1)
+    return values[int(rank)]
+
+
+if __name__ == "__main__":
+    main()
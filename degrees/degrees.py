@@ -1,6 +1,19 @@
+import argparse
 import csv
+import json
+import os
 import sys
-
+from collections import Counter
+
+from analytics import seed_statistics
+import paths
+from nameindex import dict_name_index, graph_name_index
+from ingest import read_dataset, table_path
+from landmarks import build_landmarks, open_landmarks, save_landmarks
+from graph import (
+    MoviesView, NamesView, PeopleView,
+    TreeCache, bidirectional_search, load_graph, open_snapshot, save_snapshot
+)
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -12,54 +25,211 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Sorted name index over whichever data is loaded, built on first use
+name_index = None
+
+# Compact integer-indexed graph, set when loaded with compact=True
+graph = None
+
+# Binary snapshot of the compact graph, written next to the CSV files
+SNAPSHOT = "graph.snapshot"
+TABLES = ["people", "movies", "stars"]
+
+# Landmark distance index for the compact graph, and the file it is kept in
+landmarks = None
+LANDMARKS = "landmarks.index"
 
-def load_data(directory):
+
+def load_data(directory, compact=False, year=None, movie_ids=None,
+              person_ids=None, progress=None):
     """
     Load data from CSV files into memory.
+
+    With `compact`, builds a Graph instead of the dictionaries, and
+    `names`, `people` and `movies` become read-only views onto it.
+    If the directory then holds a snapshot newer than its CSV files,
+    that snapshot is memory-mapped instead and nothing is parsed.
+    A landmark index newer than the CSV files is opened alongside
+    the compact graph.
+
+    `year`, `movie_ids` and `person_ids` load only a subgraph, as
+    described in ingest.read_dataset, and `progress` is called as
+    each chunk of rows is read. The tables may be gzip-compressed.
     """
+    global graph, names, people, movies, landmarks, name_index
+    name_index = None
+    filtered = year is not None or movie_ids is not None or person_ids is not None
+
+    if compact and not filtered and is_fresh(directory, SNAPSHOT):
+        load_compact(open_snapshot(os.path.join(directory, SNAPSHOT)))
+        load_landmarks(directory)
+        return
+
+    if compact:
+        load_compact(load_graph(directory, year, movie_ids, person_ids, progress))
+        landmarks = None
+        if not filtered:
+            load_landmarks(directory)
+        return
+
+    # Starts from empty dictionaries, replacing any earlier load
+    graph = landmarks = None
+    names, people, movies = {}, {}, {}
+
+    people_rows, movie_rows, star_rows = read_dataset(
+        directory, year, movie_ids, person_ids, progress
+    )
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    for person_id, name, birth in people_rows:
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+            "movies": set()
+        }
+        if name.lower() not in names:
+            names[name.lower()] = {person_id}
+        else:
+            names[name.lower()].add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+    for movie_id, title, released in movie_rows:
+        movies[movie_id] = {
+            "title": title,
+            "year": released,
+            "stars": set()
+        }
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    for person_id, movie_id in star_rows:
+        people[person_id]["movies"].add(movie_id)
+        movies[movie_id]["stars"].add(person_id)
+
+
+def load_compact(compact_graph):
+    """
+    Makes `compact_graph` the loaded dataset.
+    """
+    global graph, names, people, movies
+    graph = compact_graph
+    names = NamesView(graph)
+    people = PeopleView(graph)
+    movies = MoviesView(graph)
+
+
+def load_landmarks(directory):
+    """
+    Opens the landmark index in `directory` if it is up to date
+    with the loaded graph.
+    """
+    global landmarks
+    landmarks = None
+    if is_fresh(directory, LANDMARKS):
+        index = open_landmarks(os.path.join(directory, LANDMARKS))
+        if index.person_count == graph.person_count():
+            landmarks = index
+
+
+def build_landmark_index(directory, count):
+    """
+    Builds a landmark index of `count` landmarks for the data in
+    `directory` and saves it there for load_data to open.
+    """
+    load_data(directory, compact=True)
+    save_landmarks(
+        build_landmarks(graph, count), os.path.join(directory, LANDMARKS)
+    )
+
+
+def build_snapshot(directory):
+    """
+    Parse the CSV files in `directory` once and save them as a snapshot
+    that later calls to load_data will open instead.
+    """
+    save_snapshot(load_graph(directory), os.path.join(directory, SNAPSHOT))
+
+
+def is_fresh(directory, filename):
+    """
+    Returns True if `directory` has a file `filename` at least as new
+    as every CSV file it was built from.
+    """
+    try:
+        built = os.path.getmtime(os.path.join(directory, filename))
+        return all(
+            os.path.getmtime(table_path(directory, table)) <= built
+            for table in TABLES
+        )
+    except OSError:
+        return False
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="build a binary snapshot of the data and exit")
+    parser.add_argument("--landmarks", metavar="K", type=int,
+                        help="build a distance index of K landmark people and exit")
+    parser.add_argument("--batch", metavar="QUERIES",
+                        help="answer the source,target pairs in QUERIES as JSON lines")
+    parser.add_argument("--seeds", metavar="SEEDS",
+                        help="summarize distances from each person in SEEDS as JSON lines")
+    parser.add_argument("--processes", type=int,
+                        help="number of worker processes for --seeds")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write batch or seed results to FILE instead of stdout")
+    parser.add_argument("--cache-size", type=int, default=16,
+                        help="number of search trees kept for batch queries")
+    parser.add_argument("--since", metavar="YEAR", type=int,
+                        help="only load movies released in or after YEAR")
+    parser.add_argument("--until", metavar="YEAR", type=int,
+                        help="only load movies released in or before YEAR")
+    parser.add_argument("--progress", action="store_true",
+                        help="report loading progress on stderr")
+    args = parser.parse_args()
+    directory = args.directory
+
+    options = {"compact": True}
+    if args.since is not None or args.until is not None:
+        options["year"] = year_between(args.since, args.until)
+    if args.progress:
+        options["progress"] = report_progress
+
+    if args.snapshot:
+        print("Building snapshot...")
+        build_snapshot(directory)
+        print("Snapshot built.")
+        return
+
+    if args.landmarks:
+        print("Building landmark index...")
+        build_landmark_index(directory, args.landmarks)
+        print("Landmark index built.")
+        return
+
+    if args.batch or args.seeds:
+        print("Loading data...", file=sys.stderr)
+        load_data(directory, **options)
+        print("Data loaded.", file=sys.stderr)
+        output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            if args.batch:
+                with open(args.batch, encoding="utf-8") as f:
+                    queries = [row for row in csv.reader(f) if row]
+                run_batch(queries, output, args.cache_size)
+            else:
+                with open(args.seeds, encoding="utf-8") as f:
+                    seeds = [line.strip() for line in f if line.strip()]
+                run_seeds(seeds, output, args.processes)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        return
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, **options)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -69,7 +239,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = bidirectional_path(source, target)
 
     if path is None:
         print("Not connected.")
@@ -84,12 +254,13 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
-    If no possible path, returns None.
+    If no possible path, returns None. A SearchStats passed as
+    `stats` counts expanded people and the largest frontier.
     """
     # Adds source node to QueueFrontier
     start = Node(state=source, parent=None, action=None)
@@ -100,7 +271,7 @@ def shortest_path(source, target):
     path = []
 
     # Creates an empty explored set
-    explored = []
+    explored = set()
 
     # Keep looping until result is reached
     while True:
@@ -111,7 +282,9 @@ def shortest_path(source, target):
 
         # Expands a node and marks it as explored
         node = frontier.remove()
-        explored.append(node.state)
+        explored.add(node.state)
+        if stats is not None:
+            stats.expand()
         neighbors = neighbors_for_person(node.state)
 
         # Adds neighboring nodes to frontier after checking for goal state
@@ -140,6 +313,204 @@ def shortest_path(source, target):
                 else:
                     frontier.add(neighbor)
 
+        if stats is not None:
+            stats.frontier(len(frontier.frontier))
+
+
+def bidirectional_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outwards
+    from both ends at once.
+
+    Each round expands one whole layer of whichever frontier is
+    smaller, and stops at the first person reached by both searches.
+
+    If no possible path, returns None. A SearchStats passed as
+    `stats` counts expanded people and the largest frontier.
+    """
+    if graph is not None:
+        return graph_path(source, target, stats)
+
+    return paths.bidirectional_search(source, target, neighbors_for_person, stats)
+
+
+def year_between(since, until):
+    """
+    Returns a predicate for load_data that keeps movies released between
+    `since` and `until` inclusive, either of which may be None.
+    """
+    def keep(year):
+        if year is None:
+            return False
+        return (since is None or year >= since) and (until is None or year <= until)
+    return keep
+
+
+def report_progress(table, rows, rows_per_second):
+    print(f"  {table}.csv: {rows} rows ({rows_per_second:.0f} rows/s)", file=sys.stderr)
+
+
+def run_batch(queries, output, cache_size=16):
+    """
+    Answers each (source, target) pair in `queries`, writing one JSON
+    object per line to `output` as soon as it is known.
+
+    Sources and targets may be person ids or unambiguous names.
+    People who appear in more than one query get a full search tree,
+    kept in a TreeCache of `cache_size` trees and shared between their
+    queries while any are left. When the cache is full, the people with
+    the most queries left keep theirs, and the rest are answered with
+    bidirectional_path.
+    Requires the data to be loaded with compact=True.
+    """
+    queries = [
+        (query[0], query[1], resolve_person(query[0]), resolve_person(query[1]))
+        for query in queries
+    ]
+    remaining = Counter()
+    for _, _, source, target in queries:
+        if source is not None and target is not None:
+            remaining.update({source, target})
+    cache = TreeCache(graph, cache_size)
+
+    for source_name, target_name, source, target in queries:
+        result = {"source": source_name, "target": target_name}
+        if source is None or target is None:
+            missing = source_name if source is None else target_name
+            result["error"] = f"Person not found: {missing}"
+        else:
+            path = cached_path(cache, remaining, source, target)
+            result["source_id"] = source
+            result["target_id"] = target
+            result["degrees"] = None if path is None else len(path)
+            result["path"] = path
+        output.write(json.dumps(result) + "\n")
+
+
+def run_seeds(seeds, output, processes=None):
+    """
+    Writes, for each person id or unambiguous name in `seeds`, one JSON
+    object with the histogram of degrees of separation from that person
+    to everyone else and its eccentricity (the largest finite degree).
+
+    The searches run in parallel over `processes` worker processes.
+    Requires the data to be loaded with compact=True.
+    """
+    resolved = [(seed, resolve_person(seed)) for seed in seeds]
+    sources = [
+        graph.person_index(person_id)
+        for _, person_id in resolved if person_id is not None
+    ]
+    summaries = iter(seed_statistics(graph, sources, processes))
+
+    for seed, person_id in resolved:
+        result = {"seed": seed}
+        if person_id is None:
+            result["error"] = f"Person not found: {seed}"
+        else:
+            result["person_id"] = person_id
+            result.update(next(summaries))
+        output.write(json.dumps(result) + "\n")
+
+
+def cached_path(cache, remaining, source, target):
+    """
+    Returns the (movie_id, person_id) path from `source` to `target`,
+    reading it off a cached search tree for either end when possible.
+
+    `remaining` counts the queries left for each person, this one
+    included, and is counted down here. A tree is only built for
+    someone with queries left after this one, and is dropped once they
+    have none, so sources spread through the batch do not push out
+    trees that are still needed.
+    """
+    remaining.subtract({source, target})
+    if source in cache:
+        root = source
+    elif target in cache:
+        root = target
+    else:
+        root = max((source, target), key=remaining.__getitem__)
+        if not make_room(cache, remaining, root):
+            return bidirectional_path(source, target)
+
+    tree = cache.get(root)
+    for person in (source, target):
+        if remaining[person] < 1:
+            cache.discard(person)
+
+    if root == source:
+        path = tree.path_to(graph.person_index(target))
+    else:
+        path = tree.path_from(graph.person_index(source))
+    if path is None:
+        return None
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
+
+def make_room(cache, remaining, person):
+    """
+    Returns True if a search tree for `person` is worth caching, first
+    dropping the cached tree with the fewest queries left if the cache
+    is full and that tree has fewer left than `person`.
+    """
+    if remaining[person] < 1 or cache.size < 1:
+        return False
+    if len(cache) < cache.size:
+        return True
+    fewest = min(cache, key=remaining.__getitem__)
+    if remaining[fewest] >= remaining[person]:
+        return False
+    cache.discard(fewest)
+    return True
+
+
+def distance(source, target):
+    """
+    Returns the degrees of separation between two people,
+    or None if they are not connected.
+
+    Answered from the landmark index alone when its bounds meet,
+    otherwise by searching for a path.
+    """
+    if graph is not None and landmarks is not None:
+        bounds = landmarks.bounds(
+            graph.person_index(source), graph.person_index(target)
+        )
+        if bounds is None:
+            return None
+        lower, upper = bounds
+        if lower == upper:
+            return lower
+
+    path = bidirectional_path(source, target)
+    return None if path is None else len(path)
+
+
+def graph_path(source, target, stats=None):
+    """
+    Runs bidirectional_path over the compact graph, translating
+    between IMDb ids and dense indices.
+
+    With a landmark index loaded, pairs it proves disconnected are
+    answered without searching.
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    if landmarks is not None and landmarks.bounds(source, target) is None:
+        return None
+    path = bidirectional_search(graph, source, target, stats)
+    if path is None:
+        return None
+    return [
+        (graph.movie_ids[movie], graph.person_ids[person])
+        for movie, person in path
+    ]
+
 
 def person_id_for_name(name):
     """
@@ -167,6 +538,90 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, one at a time.
+    """
+    if graph is None:
+        return paths.all_shortest_paths(source, target, neighbors_for_person)
+    return graph_paths(
+        paths.all_shortest_paths(
+            graph.person_index(source), graph.person_index(target), graph.neighbors
+        )
+    )
+
+
+def k_shortest_paths(source, target, k):
+    """
+    Yields up to `k` lists of (movie_id, person_id) pairs that connect
+    the source to the target without repeating a person, shortest first.
+    """
+    if graph is None:
+        return paths.k_shortest_paths(source, target, neighbors_for_person, k)
+    return graph_paths(
+        paths.k_shortest_paths(
+            graph.person_index(source), graph.person_index(target), graph.neighbors, k
+        )
+    )
+
+
+def graph_paths(index_paths):
+    """
+    Translates paths of (movie, person) indices into IMDb ids.
+    """
+    for path in index_paths:
+        yield [
+            (graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in path
+        ]
+
+
+def person_ids_for_name(name, max_distance=0):
+    """
+    Returns the ids of everyone whose name is within `max_distance`
+    edits of `name`, without asking which one was meant.
+
+    Closer names come first, and people with more movies come first
+    among equally close names.
+    """
+    return get_name_index().candidates(name, max_distance)
+
+
+def complete_name(prefix, limit=10):
+    """
+    Returns up to `limit` lowercase names starting with `prefix`.
+    """
+    return get_name_index().complete(prefix, limit)
+
+
+def get_name_index():
+    """
+    Returns the NameIndex for the loaded data, building it if needed.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            name_index = graph_name_index(graph)
+        else:
+            name_index = dict_name_index(names, people)
+    return name_index
+
+
+def resolve_person(text):
+    """
+    Returns the person id that `text` names without asking, either as
+    an id or as a name, picking the person with the most movies when
+    several share it. Returns None if nobody matches.
+    """
+    if text in people:
+        return text
+    person_ids = person_ids_for_name(text)
+    if person_ids:
+        return person_ids[0]
+    return None
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
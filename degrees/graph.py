@@ -0,0 +1,654 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from ingest import read_dataset
+from paths import join_paths
+
+
+class Graph():
+    """
+    Co-star graph with dense integer ids for people and movies.
+
+    People and movies are numbered in order of their IMDb id, so an id
+    can be found again with a binary search. Edges are stored CSR-style:
+    the movies of person `p` are
+    `person_movies[person_movies_start[p]:person_movies_start[p + 1]]`,
+    and the stars of a movie are laid out the same way.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_movies_start, person_movies,
+                 movie_stars_start, movie_stars, name_order,
+                 name_keys=None, buffer=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_movies_start = person_movies_start
+        self.person_movies = person_movies
+        self.movie_stars_start = movie_stars_start
+        self.movie_stars = movie_stars
+
+        # Person indices sorted by lowercase name, and those lowercase names
+        self.name_order = name_order
+        if name_keys is None:
+            name_keys = NameKeys(name_order, person_names)
+        self.name_keys = name_keys
+
+        # Memory map backing the arrays, if opened from a snapshot
+        self.buffer = buffer
+
+    def person_count(self):
+        return len(self.person_ids)
+
+    def movie_count(self):
+        return len(self.movie_ids)
+
+    def person_index(self, person_id):
+        """
+        Returns the dense index for an IMDb person id, or None.
+        """
+        return find(self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the dense index for an IMDb movie id, or None.
+        """
+        return find(self.movie_ids, movie_id)
+
+    def movies_of(self, person):
+        return self.person_movies[
+            self.person_movies_start[person]:self.person_movies_start[person + 1]
+        ]
+
+    def stars_of(self, movie):
+        return self.movie_stars[
+            self.movie_stars_start[movie]:self.movie_stars_start[movie + 1]
+        ]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who starred
+        with person index `person`.
+        """
+        for movie in self.movies_of(person):
+            for neighbor in self.stars_of(movie):
+                yield movie, neighbor
+
+    def people_named(self, name):
+        """
+        Returns the indices of every person whose lowercase name is `name`.
+        """
+        keys = self.name_keys
+        i = bisect_left(keys, name)
+        matches = []
+        while i < len(keys) and keys[i] == name:
+            matches.append(self.name_order[i])
+            i += 1
+        return matches
+
+
+class NameKeys():
+    """
+    Sequence of lowercase names in `name_order`, computed on access.
+    """
+
+    def __init__(self, name_order, person_names):
+        self.name_order = name_order
+        self.person_names = person_names
+
+    def __getitem__(self, i):
+        return self.person_names[self.name_order[i]].lower()
+
+    def __len__(self):
+        return len(self.name_order)
+
+    def __iter__(self):
+        for person in self.name_order:
+            yield self.person_names[person].lower()
+
+
+def find(ids, key):
+    """
+    Returns the position of `key` in the sorted sequence `ids`, or None.
+    """
+    i = bisect_left(ids, key)
+    if i < len(ids) and ids[i] == key:
+        return i
+    return None
+
+
+def load_graph(directory, year=None, movie_ids=None, person_ids=None, progress=None):
+    """
+    Load CSV files straight into a Graph, without building
+    the per-person and per-movie dictionaries.
+
+    The filters and `progress` are passed to ingest.read_dataset.
+    """
+    people, movies, stars = read_dataset(
+        directory, year, movie_ids, person_ids, progress
+    )
+    return build_graph(people, movies, stars)
+
+
+def build_graph(people, movies, stars):
+    """
+    Returns a Graph of (id, name, birth) `people`, (id, title, year)
+    `movies` and (person_id, movie_id) `stars`.
+    """
+    rows = sorted(people)
+    person_ids = [row[0] for row in rows]
+    person_names = [row[1] for row in rows]
+    person_births = [row[2] for row in rows]
+
+    rows = sorted(movies)
+    movie_ids = [row[0] for row in rows]
+    movie_titles = [row[1] for row in rows]
+    movie_years = [row[2] for row in rows]
+    del rows
+
+    # Converts stars to pairs of dense indices, skipping unknown ids
+    person_lookup = {person_id: i for i, person_id in enumerate(person_ids)}
+    movie_lookup = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    edge_people = array("I")
+    edge_movies = array("I")
+    seen = set()
+    for person_id, movie_id in stars:
+        person = person_lookup.get(person_id)
+        movie = movie_lookup.get(movie_id)
+        if person is None or movie is None:
+            continue
+        edge = person * len(movie_ids) + movie
+        if edge in seen:
+            continue
+        seen.add(edge)
+        edge_people.append(person)
+        edge_movies.append(movie)
+    del person_lookup, movie_lookup, seen
+
+    person_movies_start, person_movies = build_csr(
+        len(person_ids), edge_people, edge_movies
+    )
+    movie_stars_start, movie_stars = build_csr(
+        len(movie_ids), edge_movies, edge_people
+    )
+    name_order = array("I", sorted(
+        range(len(person_ids)), key=lambda i: person_names[i].lower()
+    ))
+
+    return Graph(
+        person_ids, person_names, person_births,
+        movie_ids, movie_titles, movie_years,
+        person_movies_start, person_movies,
+        movie_stars_start, movie_stars, name_order
+    )
+
+
+def build_csr(count, sources, targets):
+    """
+    Groups the edges `sources[i] -> targets[i]` by source into
+    an offsets array of length `count + 1` and a targets array.
+    """
+    start = array("I", [0]) * (count + 1)
+    for source in sources:
+        start[source + 1] += 1
+    for i in range(count):
+        start[i + 1] += start[i]
+
+    position = array("I", start)
+    grouped = array("I", [0]) * len(targets)
+    for source, target in zip(sources, targets):
+        grouped[position[source]] = target
+        position[source] += 1
+    return start, grouped
+
+
+def bidirectional_search(graph, source, target, stats=None):
+    """
+    Returns the shortest list of (movie, person) index pairs connecting
+    person index `source` to `target`, or None if they are not connected.
+
+    Works like degrees.bidirectional_path, but walks the CSR arrays
+    directly and scans each movie's cast at most once per side.
+    Fills in `stats`, if given, like degrees.bidirectional_path.
+    """
+    if source == target:
+        return []
+
+    forward = {source: None}
+    backward = {target: None}
+    forward_movies = set()
+    backward_movies = set()
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        if stats is not None:
+            stats.frontier(len(forward_frontier) + len(backward_frontier))
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_csr_layer(
+                graph, forward_frontier, forward, forward_movies, backward, stats
+            )
+        else:
+            backward_frontier, meeting = expand_csr_layer(
+                graph, backward_frontier, backward, backward_movies, forward, stats
+            )
+
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    return None
+
+
+def expand_csr_layer(graph, frontier, parents, scanned, other_parents, stats=None):
+    """
+    Expands every person in `frontier` by one step, like
+    paths.expand_layer, but over the CSR arrays and skipping movies
+    in `scanned`, whose casts this side has already seen.
+
+    Returns the next frontier and the first person already reached
+    by the other search, or None if the searches have not met.
+    """
+    person_movies_start = graph.person_movies_start
+    person_movies = graph.person_movies
+    movie_stars_start = graph.movie_stars_start
+    movie_stars = graph.movie_stars
+
+    layer = []
+    for person in frontier:
+        if stats is not None:
+            stats.expand()
+        start = person_movies_start[person]
+        end = person_movies_start[person + 1]
+        for movie in person_movies[start:end]:
+
+            # A cast only needs scanning the first time a movie is reached
+            if movie in scanned:
+                continue
+            scanned.add(movie)
+
+            for neighbor in movie_stars[movie_stars_start[movie]:movie_stars_start[movie + 1]]:
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (person, movie)
+                if neighbor in other_parents:
+                    return layer, neighbor
+                layer.append(neighbor)
+    return layer, None
+
+
+class SearchTree():
+    """
+    Breadth-first search tree rooted at one person.
+
+    `parent_person[p]` and `parent_movie[p]` give the step by which `p`
+    was first reached, or -1 if it never was. The root is its own parent.
+    """
+
+    def __init__(self, root, parent_person, parent_movie):
+        self.root = root
+        self.parent_person = parent_person
+        self.parent_movie = parent_movie
+
+    def reaches(self, person):
+        return self.parent_person[person] != -1
+
+    def path_to(self, person):
+        """
+        Returns the (movie, person) index path from the root to `person`,
+        or None if it is unreachable.
+        """
+        if not self.reaches(person):
+            return None
+        path = []
+        while person != self.root:
+            path.append((self.parent_movie[person], person))
+            person = self.parent_person[person]
+        path.reverse()
+        return path
+
+    def path_from(self, person):
+        """
+        Returns the (movie, person) index path from `person` to the root,
+        or None if it is unreachable.
+        """
+        if not self.reaches(person):
+            return None
+        path = []
+        while person != self.root:
+            parent = self.parent_person[person]
+            path.append((self.parent_movie[person], parent))
+            person = parent
+        return path
+
+
+def bfs_tree(graph, source):
+    """
+    Runs a full breadth-first search from person index `source`.
+    """
+    parent_person = array("i", [-1]) * graph.person_count()
+    parent_movie = array("i", [-1]) * graph.person_count()
+    scanned = bytearray(graph.movie_count())
+    parent_person[source] = source
+
+    person_movies_start = graph.person_movies_start
+    person_movies = graph.person_movies
+    movie_stars_start = graph.movie_stars_start
+    movie_stars = graph.movie_stars
+
+    frontier = [source]
+    while frontier:
+        layer = []
+        for person in frontier:
+            start = person_movies_start[person]
+            end = person_movies_start[person + 1]
+            for movie in person_movies[start:end]:
+                if scanned[movie]:
+                    continue
+                scanned[movie] = 1
+                for neighbor in movie_stars[movie_stars_start[movie]:movie_stars_start[movie + 1]]:
+                    if parent_person[neighbor] == -1:
+                        parent_person[neighbor] = person
+                        parent_movie[neighbor] = movie
+                        layer.append(neighbor)
+        frontier = layer
+
+    return SearchTree(source, parent_person, parent_movie)
+
+
+# Distances saturate below UNREACHED so they fit in one byte each
+UNREACHED = 255
+FARTHEST = 254
+
+
+def bfs_distances(graph, source):
+    """
+    Returns an array("B") holding every person's degrees of separation
+    from person index `source`.
+
+    Distances past FARTHEST are stored as FARTHEST, and people who
+    cannot be reached at all as UNREACHED.
+    """
+    distances = array("B", [UNREACHED]) * graph.person_count()
+    scanned = bytearray(graph.movie_count())
+    distances[source] = 0
+
+    person_movies_start = graph.person_movies_start
+    person_movies = graph.person_movies
+    movie_stars_start = graph.movie_stars_start
+    movie_stars = graph.movie_stars
+
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth = min(depth + 1, FARTHEST)
+        layer = []
+        for person in frontier:
+            start = person_movies_start[person]
+            end = person_movies_start[person + 1]
+            for movie in person_movies[start:end]:
+                if scanned[movie]:
+                    continue
+                scanned[movie] = 1
+                for neighbor in movie_stars[movie_stars_start[movie]:movie_stars_start[movie + 1]]:
+                    if distances[neighbor] == UNREACHED:
+                        distances[neighbor] = depth
+                        layer.append(neighbor)
+        frontier = layer
+
+    return distances
+
+
+class TreeCache():
+    """
+    Cache of at most `size` SearchTrees keyed by IMDb person id.
+
+    Callers choose which trees to give up with `discard`. Should a new
+    tree still not fit, the least recently used one is dropped.
+    """
+
+    def __init__(self, graph, size=16):
+        self.graph = graph
+        self.size = size
+        self.trees = OrderedDict()
+
+    def __contains__(self, person_id):
+        return person_id in self.trees
+
+    def __iter__(self):
+        return iter(self.trees)
+
+    def __len__(self):
+        return len(self.trees)
+
+    def discard(self, person_id):
+        """
+        Drops the search tree rooted at `person_id`, if there is one.
+        """
+        self.trees.pop(person_id, None)
+
+    def get(self, person_id):
+        """
+        Returns the search tree rooted at `person_id`, building it
+        and evicting the least recently used tree if needed.
+        """
+        tree = self.trees.get(person_id)
+        if tree is not None:
+            self.trees.move_to_end(person_id)
+            return tree
+
+        tree = bfs_tree(self.graph, self.graph.person_index(person_id))
+        self.trees[person_id] = tree
+        if len(self.trees) > self.size:
+            self.trees.popitem(last=False)
+        return tree
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view of a Graph shaped like degrees.people.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie] for movie in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return self.graph.person_count()
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view of a Graph shaped like degrees.movies.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[person] for person in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return self.graph.movie_count()
+
+
+class NamesView(Mapping):
+    """
+    Read-only view of a Graph shaped like degrees.names.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        graph = self.graph
+        matches = graph.people_named(name)
+        if not matches:
+            raise KeyError(name)
+        return {graph.person_ids[person] for person in matches}
+
+    def __iter__(self):
+        previous = None
+        for name in self.graph.name_keys:
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+# Snapshot layout: magic, byte order, then (offset, length) of each section
+SNAPSHOT_MAGIC = b"DEGSNAP1"
+SNAPSHOT_STRINGS = [
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years", "name_keys"
+]
+SNAPSHOT_ARRAYS = [
+    "person_movies_start", "person_movies",
+    "movie_stars_start", "movie_stars", "name_order"
+]
+SNAPSHOT_HEADER = struct.Struct(
+    f"<8s8s{2 * (2 * len(SNAPSHOT_STRINGS) + len(SNAPSHOT_ARRAYS))}Q"
+)
+
+
+def save_snapshot(graph, path):
+    """
+    Write `graph` to `path` as a binary snapshot that open_snapshot
+    can memory-map without parsing.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(encode_snapshot(graph))
+    os.replace(temporary, path)
+
+
+def encode_snapshot(graph):
+    """
+    Returns the snapshot bytes for `graph`.
+    """
+    # A graph opened from a snapshot already is one
+    if graph.buffer is not None:
+        return bytes(graph.buffer)
+
+    sections = []
+    for field in SNAPSHOT_STRINGS:
+        offsets = array("Q", [0])
+        blob = bytearray()
+        for value in getattr(graph, field):
+            blob += value.encode("utf-8")
+            offsets.append(len(blob))
+        sections.append(offsets.tobytes())
+        sections.append(bytes(blob))
+    for field in SNAPSHOT_ARRAYS:
+        sections.append(array("I", getattr(graph, field)).tobytes())
+
+    # Lays sections out after the header, each aligned to 8 bytes
+    table = []
+    position = SNAPSHOT_HEADER.size
+    for section in sections:
+        table.extend((position, len(section)))
+        position += padded(len(section))
+
+    data = bytearray(SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, sys.byteorder.encode().ljust(8), *table
+    ))
+    for section in sections:
+        data += section
+        data += bytes(padded(len(section)) - len(section))
+    return bytes(data)
+
+
+def open_snapshot(path):
+    """
+    Memory-map a snapshot written by save_snapshot as a Graph.
+
+    Nothing is decoded up front: strings and arrays are read
+    from the mapped file as they are accessed.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return read_snapshot(buffer)
+
+
+def read_snapshot(buffer):
+    """
+    Returns a Graph backed by the snapshot bytes in `buffer`.
+    """
+    view = memoryview(buffer)
+    magic, byteorder, *table = SNAPSHOT_HEADER.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC or byteorder.strip() != sys.byteorder.encode():
+        raise ValueError("not a degrees snapshot for this machine")
+    sections = [
+        view[table[i]:table[i] + table[i + 1]]
+        for i in range(0, len(table), 2)
+    ]
+
+    fields = {}
+    for field in SNAPSHOT_STRINGS:
+        offsets = sections.pop(0).cast("Q")
+        fields[field] = StringTable(offsets, sections.pop(0))
+    for field in SNAPSHOT_ARRAYS:
+        fields[field] = sections.pop(0).cast("I")
+
+    return Graph(**fields, buffer=buffer)
+
+
+def padded(size):
+    return (size + 7) // 8 * 8
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as UTF-8 in one buffer.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,107 @@
+import csv
+import gzip
+import itertools
+import os
+import time
+
+# Rows read between progress reports
+CHUNK_SIZE = 100000
+
+
+def table_path(directory, name):
+    """
+    Returns the path of `name`.csv in `directory`, or of `name`.csv.gz
+    if only the compressed file exists.
+    """
+    path = os.path.join(directory, f"{name}.csv")
+    if not os.path.exists(path) and os.path.exists(f"{path}.gz"):
+        return f"{path}.gz"
+    return path
+
+
+def open_table(directory, name):
+    """
+    Opens a CSV table as text, decompressing it on the fly if needed.
+    """
+    path = table_path(directory, name)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def stream_rows(directory, name, columns, progress=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields tuples of `columns` from each row of a CSV table,
+    `chunk_size` rows at a time.
+
+    After every chunk, calls `progress(name, rows, rows_per_second)`
+    with the running totals for the table.
+    """
+    with open_table(directory, name) as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(column) for column in columns]
+
+        rows = 0
+        started = time.perf_counter()
+        while True:
+            chunk = list(itertools.islice(reader, chunk_size))
+            if not chunk:
+                break
+            for row in chunk:
+                yield tuple(row[i] for i in positions)
+            rows += len(chunk)
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                progress(name, rows, rows / elapsed if elapsed else 0)
+
+
+def read_dataset(directory, year=None, movie_ids=None, person_ids=None, progress=None):
+    """
+    Streams the people, movies and stars tables of `directory` and returns
+    only the subgraph matching the filters, as three lists of tuples:
+    (id, name, birth), (id, title, year) and (person_id, movie_id).
+
+    `year` is a predicate on a movie's year (an int, or None if unknown),
+    and `movie_ids` and `person_ids` restrict which movies and people are
+    kept. With any filter set, people who star in none of the kept movies
+    are dropped too.
+    """
+    filtered = year is not None or movie_ids is not None or person_ids is not None
+
+    # Movies decide which star rows are kept
+    movies = []
+    for movie_id, title, released in stream_rows(
+        directory, "movies", ["id", "title", "year"], progress
+    ):
+        if movie_ids is not None and movie_id not in movie_ids:
+            continue
+        if year is not None and not year(int(released) if released.isdigit() else None):
+            continue
+        movies.append((movie_id, title, released))
+    kept_movies = {movie[0] for movie in movies}
+
+    stars = []
+    starring = set()
+    for person_id, movie_id in stream_rows(
+        directory, "stars", ["person_id", "movie_id"], progress
+    ):
+        if movie_id not in kept_movies:
+            continue
+        if person_ids is not None and person_id not in person_ids:
+            continue
+        stars.append((person_id, movie_id))
+        starring.add(person_id)
+    del kept_movies
+
+    people = []
+    for person in stream_rows(directory, "people", ["id", "name", "birth"], progress):
+        if filtered and person[0] not in starring:
+            continue
+        people.append(person)
+
+    # Drops stars whose person is missing from people.csv
+    known = {person[0] for person in people}
+    stars = [star for star in stars if star[0] in known]
+
+    return people, movies, stars
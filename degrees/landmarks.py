@@ -0,0 +1,200 @@
+import heapq
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from graph import FARTHEST, UNREACHED, bfs_distances
+from paths import join_paths
+
+# Index layout: magic, byte order, landmark and person counts,
+# then the landmark indices and one row of distances per landmark
+LANDMARK_MAGIC = b"DEGLMK01"
+LANDMARK_HEADER = struct.Struct("<8s8sQQ")
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from a few landmark people to everyone.
+
+    Row `i` of `distances` holds one byte per person for landmark
+    `landmarks[i]`, in the format of graph.bfs_distances. By the triangle
+    inequality these rows bound the distance between any two people.
+    """
+
+    def __init__(self, landmarks, distances, buffer=None):
+        self.landmarks = landmarks
+        self.distances = distances
+        self.person_count = len(distances) // len(landmarks) if landmarks else 0
+
+        # Memory map backing the distances, if opened from a file
+        self.buffer = buffer
+
+    def rows(self, person):
+        """
+        Returns each landmark's distance to person index `person`.
+        """
+        return [
+            self.distances[i * self.person_count + person]
+            for i in range(len(self.landmarks))
+        ]
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        two person indices, with upper None if no landmark gives one.
+
+        Returns None if some landmark reaches exactly one of them,
+        which proves they are not connected.
+        """
+        lower = 0
+        upper = None
+        for a, b in zip(self.rows(source), self.rows(target)):
+            if a == UNREACHED and b == UNREACHED:
+                continue
+            if a == UNREACHED or b == UNREACHED:
+                return None
+            lower = max(lower, abs(a - b))
+
+            # Saturated distances are only good for lower bounds
+            if a < FARTHEST and b < FARTHEST:
+                upper = a + b if upper is None else min(upper, a + b)
+        return lower, upper
+
+    def heuristic(self, target):
+        """
+        Returns a function giving an admissible estimate of the distance
+        from any person index to `target`.
+        """
+        target_rows = [
+            (i * self.person_count, distance)
+            for i, distance in enumerate(self.rows(target))
+            if distance != UNREACHED
+        ]
+        distances = self.distances
+
+        def estimate(person):
+            best = 0
+            for offset, distance in target_rows:
+                other = distances[offset + person]
+                if other != UNREACHED:
+                    best = max(best, abs(other - distance))
+            return best
+
+        return estimate
+
+
+def choose_landmarks(graph, count):
+    """
+    Returns the `count` person indices with the most co-star edges,
+    counted as the total cast size of their movies.
+    """
+    movie_stars_start = graph.movie_stars_start
+    cast = [
+        movie_stars_start[movie + 1] - movie_stars_start[movie]
+        for movie in range(graph.movie_count())
+    ]
+    degree = [
+        sum(cast[movie] for movie in graph.movies_of(person))
+        for person in range(graph.person_count())
+    ]
+    return sorted(range(len(degree)), key=lambda person: -degree[person])[:count]
+
+
+def build_landmarks(graph, count=8):
+    """
+    Picks `count` landmarks and runs one breadth-first search from each.
+    """
+    landmarks = array("I", choose_landmarks(graph, count))
+    distances = array("B")
+    for landmark in landmarks:
+        distances.extend(bfs_distances(graph, landmark))
+    return LandmarkIndex(landmarks, distances)
+
+
+def save_landmarks(index, path):
+    """
+    Write `index` to `path` in a form open_landmarks can memory-map.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(LANDMARK_HEADER.pack(
+            LANDMARK_MAGIC, sys.byteorder.encode().ljust(8),
+            len(index.landmarks), index.person_count
+        ))
+        f.write(array("Q", index.landmarks).tobytes())
+        f.write(index.distances)
+    os.replace(temporary, path)
+
+
+def open_landmarks(path):
+    """
+    Memory-map a landmark index written by save_landmarks.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(buffer)
+
+    magic, byteorder, count, person_count = LANDMARK_HEADER.unpack_from(view)
+    if magic != LANDMARK_MAGIC or byteorder.strip() != sys.byteorder.encode():
+        raise ValueError(f"{path} is not a landmark index for this machine")
+    start = LANDMARK_HEADER.size
+    landmarks = view[start:start + 8 * count].cast("Q")
+    start += 8 * count
+    distances = view[start:start + count * person_count]
+    return LandmarkIndex(landmarks, distances, buffer=buffer)
+
+
+def astar_search(graph, index, source, target, stats=None):
+    """
+    Returns the shortest list of (movie, person) index pairs connecting
+    person index `source` to `target`, or None if they are not connected.
+
+    Runs A* with the landmark lower bounds as its heuristic, so people
+    that lead away from the target are expanded late or not at all.
+    Fills in `stats`, if given, like degrees.bidirectional_path.
+    """
+    if index.bounds(source, target) is None:
+        return None
+    if source == target:
+        return []
+
+    estimate = index.heuristic(target)
+    person_movies_start = graph.person_movies_start
+    person_movies = graph.person_movies
+    movie_stars_start = graph.movie_stars_start
+    movie_stars = graph.movie_stars
+
+    # Maps each reached person to the (person, movie) it was reached from
+    parents = {source: None}
+    depth = {source: 0}
+    expanded = set()
+
+    # Entries hold the negated cost, so that among people with the same
+    # estimate the deepest comes first and the search heads for the target
+    queue = [(estimate(source), 0, source)]
+
+    while queue:
+        _, negated, person = heapq.heappop(queue)
+        cost = -negated
+        if person == target:
+            return join_paths(target, parents, {target: None})
+        if person in expanded:
+            continue
+        expanded.add(person)
+        if stats is not None:
+            stats.expand()
+            stats.frontier(len(queue))
+
+        start = person_movies_start[person]
+        end = person_movies_start[person + 1]
+        for movie in person_movies[start:end]:
+            for neighbor in movie_stars[movie_stars_start[movie]:movie_stars_start[movie + 1]]:
+                if neighbor in depth and depth[neighbor] <= cost + 1:
+                    continue
+                parents[neighbor] = (person, movie)
+                depth[neighbor] = cost + 1
+                heapq.heappush(queue, (cost + 1 + estimate(neighbor), -(cost + 1), neighbor))
+
+    return None
@@ -0,0 +1,329 @@
+import itertools
+from array import array
+from bisect import bisect_left
+
+# Sorts after any character that can appear in a name
+LAST_CHARACTER = chr(0x10FFFF)
+
+# Largest edit distance answered from an index of name parts rather
+# than by walking the trie
+INDEXED_DISTANCE = 3
+
+# Keeps hashes of name parts within an unsigned 64-bit array
+HASH_MASK = (1 << 64) - 1
+
+
+class NameIndex():
+    """
+    Lowercase names in sorted order, searchable by prefix and by
+    edit distance without building a separate trie.
+
+    The sorted sequence is walked as an implicit trie: every prefix
+    covers one contiguous range of `keys`, found by binary search.
+    Fuzzy lookups within INDEXED_DISTANCE edits use an index of name
+    parts instead, built on first use.
+    """
+
+    def __init__(self, keys, person_ids, popularity):
+        # Sorted lowercase names, possibly repeated once per person
+        self.keys = keys
+
+        # Maps an edit distance to sorted hashes of pairs of name parts,
+        # the position of the name each came from and the shifts to look
+        # them up at, filled in by build_parts
+        self.parts = {}
+
+        # Character masks of `keys`, to rule names out before comparing
+        self.characters = None
+
+        # Returns the person ids stored at a position of `keys`
+        self.person_ids = person_ids
+
+        # Returns how many movies a person starred in
+        self.popularity = popularity
+
+    def range(self, prefix, lo=0, hi=None):
+        """
+        Returns the range of positions whose names start with `prefix`.
+        """
+        if hi is None:
+            hi = len(self.keys)
+        start = bisect_left(self.keys, prefix, lo, hi)
+        end = bisect_left(self.keys, prefix + LAST_CHARACTER, start, hi)
+        return start, end
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to `limit` distinct names starting with `prefix`.
+        """
+        start, end = self.range(prefix.lower())
+        completions = []
+        for i in range(start, end):
+            if not completions or completions[-1] != self.keys[i]:
+                completions.append(self.keys[i])
+                if len(completions) == limit:
+                    break
+        return completions
+
+    def fuzzy(self, name, max_distance=2):
+        """
+        Returns (name, distance) for every distinct name within
+        `max_distance` edits of `name`, closest first.
+        """
+        name = name.lower()
+        matches = []
+        if max_distance <= INDEXED_DISTANCE:
+            positions = character_positions(name)
+            for i in self.lookup(name, max_distance):
+                distance = edit_distance(positions, len(name), self.keys[i])
+                if distance <= max_distance:
+                    matches.append((self.keys[i], distance))
+        else:
+            first_row = list(range(len(name) + 1))
+            self.search("", first_row, 0, len(self.keys), name, max_distance, matches)
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+    def build_parts(self, max_distance):
+        """
+        Indexes every distinct name, cut into `max_distance` + 2 parts,
+        by each pair of its parts along with where they were cut.
+
+        Any edits of at most `max_distance` leave at least two of those
+        parts untouched, so every name that close to a query shares one
+        such pair with it, only shifted by the edits made before them.
+        """
+        if self.characters is None:
+            self.characters = array("Q", (character_mask(key) for key in self.keys))
+
+        entries = []
+        count = max_distance + 2
+        for i, key in enumerate(self.keys):
+            if i and key == self.keys[i - 1]:
+                continue
+            bounds = [k * len(key) // count for k in range(count + 1)]
+            parts = [key[bounds[k]:bounds[k + 1]] for k in range(count)]
+            for first, second in itertools.combinations(range(count), 2):
+                pair = (len(key), first, second, parts[first], parts[second])
+                entries.append((hash(pair) & HASH_MASK) << 32 | i)
+        entries.sort()
+        self.parts[max_distance] = (
+            array("Q", (entry >> 32 for entry in entries)),
+            array("I", (entry & 0xFFFFFFFF for entry in entries)),
+            part_shifts(count, max_distance)
+        )
+
+    def lookup(self, name, max_distance):
+        """
+        Returns the positions of distinct names that may be within
+        `max_distance` edits of `name`, which must be lowercase and at
+        most INDEXED_DISTANCE, including every one that is.
+        """
+        if max_distance not in self.parts:
+            self.build_parts(max_distance)
+        hashes, positions, shifts = self.parts[max_distance]
+
+        found = set()
+        count = max_distance + 2
+        for length in range(max(len(name) - max_distance, 0),
+                            len(name) + max_distance + 1):
+            bounds = [k * length // count for k in range(count + 1)]
+            for first, second, before, after in shifts[len(name) - length]:
+                a = bounds[first] + before
+                b = bounds[second] + after
+                if a < 0 or b < 0 or bounds[second + 1] + after > len(name):
+                    continue
+                pair = (
+                    length, first, second,
+                    name[a:bounds[first + 1] + before],
+                    name[b:bounds[second + 1] + after]
+                )
+                target = hash(pair) & HASH_MASK
+                i = bisect_left(hashes, target)
+                while i < len(hashes) and hashes[i] == target:
+                    found.add(positions[i])
+                    i += 1
+
+        # Every character one name holds more often than the other costs an edit
+        mask = character_mask(name)
+        return [
+            i for i in found
+            if (self.characters[i] & ~mask).bit_count() <= max_distance
+            and (mask & ~self.characters[i]).bit_count() <= max_distance
+        ]
+
+    def search(self, prefix, row, lo, hi, name, max_distance, matches):
+        """
+        Visits the names in `lo:hi`, which all start with `prefix`.
+        `row` holds the edit distances from `prefix` to each prefix
+        of `name`, as in the Wagner-Fischer algorithm.
+        """
+        depth = len(prefix)
+
+        # Names equal to the prefix sort first in the range
+        while lo < hi and len(self.keys[lo]) == depth:
+            if row[-1] <= max_distance:
+                if not matches or matches[-1][0] != prefix:
+                    matches.append((prefix, row[-1]))
+            lo += 1
+
+        # Groups the rest by their next character
+        while lo < hi:
+            child = prefix + self.keys[lo][depth]
+            start, end = self.range(child, lo, hi)
+
+            next_row = [row[0] + 1]
+            for column in range(1, len(name) + 1):
+                next_row.append(min(
+                    next_row[column - 1] + 1,
+                    row[column] + 1,
+                    row[column - 1] + (name[column - 1] != child[-1])
+                ))
+
+            # No extension of this prefix can get back under the bound
+            if min(next_row) <= max_distance:
+                self.search(child, next_row, start, end, name, max_distance, matches)
+            lo = end
+
+    def candidates(self, name, max_distance=0):
+        """
+        Returns the ids of every person whose name is within
+        `max_distance` edits of `name`, without asking which one
+        was meant. Closer names come first, then people with
+        more movies.
+        """
+        ranked = []
+        if max_distance == 0:
+            matches = [(name.lower(), 0)]
+        else:
+            matches = self.fuzzy(name, max_distance)
+        for match, distance in matches:
+            start, end = self.range(match)
+            for i in range(start, end):
+                if self.keys[i] != match:
+                    break
+                for person_id in self.person_ids(i):
+                    ranked.append((distance, -self.popularity(person_id), person_id))
+        ranked.sort()
+        return [person_id for _, _, person_id in ranked]
+
+
+def part_shifts(count, max_distance):
+    """
+    Maps how much longer a query is than a name to every (first, second,
+    before, after) where parts `first` and `second` of the name, shifted
+    `before` and `after` characters, can both appear unedited in a query
+    within `max_distance` edits.
+    """
+    shifts = {}
+    for grown in range(-max_distance, max_distance + 1):
+        shifts[grown] = []
+        for first, second in itertools.combinations(range(count), 2):
+            for before in range(-max_distance, max_distance + 1):
+                for after in range(-max_distance, max_distance + 1):
+                    # The first part cannot move, and the last must end the query
+                    if first == 0 and before != 0:
+                        continue
+                    if second == count - 1 and after != grown:
+                        continue
+                    edits = abs(before) + abs(after - before) + abs(grown - after)
+                    if edits <= max_distance:
+                        shifts[grown].append((first, second, before, after))
+    return shifts
+
+
+def character_mask(name):
+    """
+    Returns a bitmask of the characters in `name`, and of those it holds
+    more than once, some sharing a bit.
+    """
+    mask = 0
+    for character in set(name):
+        mask |= 1 << (ord(character) & 63)
+        if name.count(character) > 1:
+            mask |= 1 << (ord(character) + 32 & 63)
+    return mask
+
+
+def character_positions(name):
+    """
+    Maps each character of `name` to a bitmask of where it appears.
+    """
+    positions = {}
+    for i, character in enumerate(name):
+        positions[character] = positions.get(character, 0) | 1 << i
+    return positions
+
+
+def edit_distance(positions, length, key):
+    """
+    Returns the edit distance from a name of `length` characters, whose
+    `character_positions` are `positions`, to `key`.
+
+    Uses Myers' bit-parallel algorithm: one column of the Wagner-Fischer
+    table is held as bitmasks of where it steps up or down, so each
+    character of `key` costs a few integer operations.
+    """
+    if length == 0:
+        return len(key)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    up, down, distance = full, 0, length
+    for character in key:
+        match = positions.get(character, 0)
+        vertical = match | down
+        horizontal = (((match & up) + up) ^ up) | match
+
+        # Where the next column steps up or down along each row
+        rising = down | (~(horizontal | up) & full)
+        falling = up & horizontal
+        if rising & last:
+            distance += 1
+        elif falling & last:
+            distance -= 1
+        rising = (rising << 1 | 1) & full
+        falling = (falling << 1) & full
+        up = falling | (~(vertical | rising) & full)
+        down = rising & vertical
+    return distance
+
+
+def graph_name_index(graph):
+    """
+    Returns a NameIndex over the names stored in a compact Graph.
+
+    The lowercase names are read out of the graph once, rather than
+    decoded again on every probe of a lookup.
+    """
+    # Indices of the people person_ids has returned, so that popularity
+    # need not search the ids for them again
+    indices = {}
+
+    def person_ids(i):
+        person = graph.name_order[i]
+        indices[graph.person_ids[person]] = person
+        return [graph.person_ids[person]]
+
+    def popularity(person_id):
+        person = indices.get(person_id)
+        if person is None:
+            person = graph.person_index(person_id)
+        return len(graph.movies_of(person))
+
+    return NameIndex(list(graph.name_keys), person_ids, popularity)
+
+
+def dict_name_index(names, people):
+    """
+    Returns a NameIndex over the `names` and `people` dictionaries
+    filled in by degrees.load_data.
+    """
+    keys = sorted(names)
+
+    def person_ids(i):
+        return names[keys[i]]
+
+    def popularity(person_id):
+        return len(people[person_id]["movies"])
+
+    return NameIndex(keys, person_ids, popularity)
@@ -0,0 +1,240 @@
+import heapq
+import itertools
+
+
+def shortest_path_dag(source, target, neighbors):
+    """
+    Runs a breadth-first search from `source` that stops after the layer
+    holding `target`, recording every way each person was reached at
+    their minimal depth.
+
+    `neighbors(person)` yields the (movie, person) steps out of a person.
+    Returns a dict mapping each reached person to a list of
+    (parent, movie) steps, or None if `target` is unreachable.
+    """
+    parents = {source: []}
+    depth = {source: 0}
+    frontier = [source]
+
+    while frontier and target not in parents:
+        layer = []
+        for person in frontier:
+            for movie, neighbor in neighbors(person):
+                seen = depth.get(neighbor)
+                if seen is None:
+                    depth[neighbor] = depth[person] + 1
+                    parents[neighbor] = [(person, movie)]
+                    layer.append(neighbor)
+                elif seen == depth[person] + 1:
+                    parents[neighbor].append((person, movie))
+        frontier = layer
+
+    if target not in parents:
+        return None
+    return parents
+
+
+def all_shortest_paths(source, target, neighbors):
+    """
+    Yields every shortest list of (movie, person) steps from `source` to
+    `target`, one at a time.
+
+    Paths are read backwards off the search DAG with an explicit stack,
+    so only the current path is held in memory however many there are.
+    """
+    if source == target:
+        yield []
+        return
+
+    parents = shortest_path_dag(source, target, neighbors)
+    if parents is None:
+        return
+
+    # Each entry pairs a person with the iterator over their parents
+    suffix = []
+    stack = [(target, iter(parents[target]))]
+    while stack:
+        person, remaining = stack[-1]
+        step = next(remaining, None)
+        if step is None:
+            stack.pop()
+            if suffix:
+                suffix.pop()
+            continue
+
+        parent, movie = step
+        suffix.append((movie, person))
+        if parent == source:
+            yield suffix[::-1]
+            suffix.pop()
+        else:
+            stack.append((parent, iter(parents[parent])))
+
+
+def k_shortest_paths(source, target, neighbors, k):
+    """
+    Yields up to `k` simple paths from `source` to `target` as lists of
+    (movie, person) steps, shortest first, using Yen's algorithm.
+
+    No person appears twice in a path, but two paths may differ only in
+    the movie that links the same pair of people.
+    """
+    if k < 1:
+        return
+    first = restricted_path(source, target, neighbors, set(), set())
+    if first is None:
+        return
+
+    found = [first]
+    yield first
+    candidates = []
+    queued = {tuple(first)}
+    counter = itertools.count()
+
+    while len(found) < k:
+        previous = found[-1]
+        people = [source] + [person for _, person in previous]
+
+        # Deviates from the previous path at each of its people in turn
+        for i in range(len(previous)):
+            spur = people[i]
+            root = previous[:i]
+
+            blocked_steps = set()
+            for path in found:
+                if path[:i] == root and len(path) > i:
+                    movie, person = path[i]
+                    blocked_steps.add((spur, movie, person))
+            blocked_people = set(people[:i])
+
+            detour = restricted_path(
+                spur, target, neighbors, blocked_people, blocked_steps
+            )
+            if detour is None:
+                continue
+            candidate = root + detour
+            if tuple(candidate) not in queued:
+                queued.add(tuple(candidate))
+                heapq.heappush(candidates, (len(candidate), next(counter), candidate))
+
+        if not candidates:
+            return
+        _, _, path = heapq.heappop(candidates)
+        found.append(path)
+        yield path
+
+
+def restricted_path(source, target, neighbors, blocked_people, blocked_steps):
+    """
+    Returns the shortest list of (movie, person) steps from `source` to
+    `target` that avoids every person in `blocked_people` and every
+    (person, movie, person) step in `blocked_steps`, or None.
+    """
+    if source == target:
+        return []
+
+    parents = {source: None}
+    frontier = [source]
+    while frontier:
+        layer = []
+        for person in frontier:
+            for movie, neighbor in neighbors(person):
+                if neighbor in parents or neighbor in blocked_people:
+                    continue
+                if (person, movie, neighbor) in blocked_steps:
+                    continue
+                parents[neighbor] = (person, movie)
+                if neighbor == target:
+                    return join_paths(target, parents, {target: None})
+                layer.append(neighbor)
+        frontier = layer
+
+    return None
+
+
+def bidirectional_search(source, target, neighbors, stats=None):
+    """
+    Returns the shortest list of (movie, person) steps from `source` to
+    `target`, searching outwards from both ends at once, or None.
+
+    Each round expands one whole layer of whichever frontier is
+    smaller, and stops at the first person reached by both searches.
+    A SearchStats passed as `stats` counts expanded people and the
+    largest frontier.
+    """
+    if source == target:
+        return []
+
+    # Maps each reached person to the (person, movie) it was reached from
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        if stats is not None:
+            stats.frontier(len(forward_frontier) + len(backward_frontier))
+
+        # Always grows the cheaper side
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_layer(
+                forward_frontier, neighbors, forward, backward, stats
+            )
+        else:
+            backward_frontier, meeting = expand_layer(
+                backward_frontier, neighbors, backward, forward, stats
+            )
+
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    return None
+
+
+def expand_layer(frontier, neighbors, parents, other_parents, stats=None):
+    """
+    Expands every person in `frontier` by one step, recording new
+    people in `parents`.
+
+    Returns the next frontier and the first person already reached
+    by the other search, or None if the searches have not met.
+    """
+    layer = []
+    for person in frontier:
+        if stats is not None:
+            stats.expand()
+        for movie, neighbor in neighbors(person):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = (person, movie)
+            if neighbor in other_parents:
+                return layer, neighbor
+            layer.append(neighbor)
+    return layer, None
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Builds the (movie, person) path through `meeting` from the parent
+    maps of a search from each end, which map every person reached to
+    the (person, movie) step it was reached by, or None at the ends.
+
+    Serves the dictionary and compact graph searches alike.
+    """
+    # Walks back from the meeting person to the source
+    path = []
+    person = meeting
+    while forward[person] is not None:
+        parent, movie = forward[person]
+        path.append((movie, person))
+        person = parent
+    path.reverse()
+
+    # Walks on from the meeting person to the target
+    person = meeting
+    while backward[person] is not None:
+        child, movie = backward[person]
+        path.append((movie, child))
+        person = child
+
+    return path
@@ -0,0 +1,324 @@
+import heapq
+from collections import OrderedDict
+
+from ingest import read_dataset
+from paths import restricted_path
+
+
+class DistanceTree():
+    """
+    Shortest-path tree rooted at one person, kept up to date as edges
+    come and go instead of being searched again.
+
+    `distance` maps every reachable person to their degrees of separation
+    from the root, and `parent` maps them to the (person_id, movie_id)
+    step they are reached by, which is None for the root.
+    """
+
+    def __init__(self, root, neighbors):
+        self.root = root
+        self.neighbors = neighbors
+        self.distance = {root: 0}
+        self.parent = {root: None}
+
+        # Maps each person to the people whose parent step leaves from them
+        self.children = {}
+        self.settle([(0, root)])
+
+    def attach(self, person, distance, step):
+        """
+        Sets the distance of `person` and the step it is reached by,
+        moving it between its old and new parent's children.
+        """
+        old = self.parent.get(person)
+        if old is not None:
+            self.children[old[0]].discard(person)
+        self.distance[person] = distance
+        self.parent[person] = step
+        self.children.setdefault(step[0], set()).add(person)
+
+    def settle(self, queue):
+        """
+        Lowers distances outwards from the (distance, person) entries
+        in `queue` until no step can shorten any of them.
+        """
+        heapq.heapify(queue)
+        while queue:
+            distance, person = heapq.heappop(queue)
+            if distance != self.distance.get(person):
+                continue
+            for movie_id, neighbor in self.neighbors(person):
+                if distance + 1 < self.distance.get(neighbor, distance + 2):
+                    self.attach(neighbor, distance + 1, (person, movie_id))
+                    heapq.heappush(queue, (distance + 1, neighbor))
+
+    def edges_added(self, edges):
+        """
+        Repairs the tree after the (person_id, movie_id, person_id)
+        `edges` were added, which can only bring people closer.
+        """
+        queue = []
+        for a, movie_id, b in edges:
+            for near, far in ((a, b), (b, a)):
+                if near not in self.distance:
+                    continue
+                distance = self.distance[near] + 1
+                if far not in self.distance or distance < self.distance[far]:
+                    self.attach(far, distance, (near, movie_id))
+                    queue.append((distance, far))
+        self.settle(queue)
+
+    def edges_removed(self, people, removed):
+        """
+        Repairs the tree after edges were removed, where `removed(person_id,
+        step)` says whether a person's parent step no longer exists.
+
+        Only `people`, who include everyone reached by a removed edge,
+        are checked, and only the subtrees hanging from removed steps
+        are searched again, starting from the intact part of the tree
+        around them.
+        """
+        cut = [
+            person for person in people
+            if self.parent.get(person) is not None
+            and removed(person, self.parent[person])
+        ]
+        if not cut:
+            return
+
+        # Unsettles everyone whose tree path ran through a removed step
+        detached = set()
+        stack = cut
+        while stack:
+            person = stack.pop()
+            if person in detached:
+                continue
+            detached.add(person)
+            stack.extend(self.children.get(person, ()))
+        for person in detached:
+            self.children[self.parent[person][0]].discard(person)
+        for person in detached:
+            self.children.pop(person, None)
+            del self.distance[person]
+            del self.parent[person]
+
+        # Reattaches them to their closest remaining neighbor, if any
+        queue = []
+        for person in detached:
+            for movie_id, neighbor in self.neighbors(person):
+                distance = self.distance.get(neighbor)
+                if distance is None:
+                    continue
+                if person not in self.distance or distance + 1 < self.distance[person]:
+                    self.attach(person, distance + 1, (neighbor, movie_id))
+            if person in self.distance:
+                queue.append((self.distance[person], person))
+        self.settle(queue)
+
+    def path_to(self, person_id):
+        """
+        Returns the (movie_id, person_id) path from the root to
+        `person_id`, or None if it is unreachable.
+        """
+        if person_id not in self.parent:
+            return None
+        path = []
+        while self.parent[person_id] is not None:
+            parent, movie_id = self.parent[person_id]
+            path.append((movie_id, person_id))
+            person_id = parent
+        path.reverse()
+        return path
+
+
+class DegreesService():
+    """
+    Long-running owner of a mutable degrees dataset.
+
+    Movies and cast edges can be added and removed at any time. Cached
+    search trees and landmark trees are repaired in place after every
+    change, so they keep answering queries without being rebuilt.
+    """
+
+    def __init__(self, people, movies, cache_size=16):
+        # Shaped like degrees.people and degrees.movies
+        self.people = people
+        self.movies = movies
+        self.names = {}
+        for person_id, person in people.items():
+            self.names.setdefault(person["name"].lower(), set()).add(person_id)
+
+        self.cache_size = cache_size
+        self.trees = OrderedDict()
+        self.landmarks = {}
+
+    @classmethod
+    def load(cls, directory, cache_size=16, **filters):
+        """
+        Returns a service over the data in `directory`, loaded with
+        the filters accepted by ingest.read_dataset.
+        """
+        people_rows, movie_rows, star_rows = read_dataset(directory, **filters)
+        people = {
+            person_id: {"name": name, "birth": birth, "movies": set()}
+            for person_id, name, birth in people_rows
+        }
+        movies = {
+            movie_id: {"title": title, "year": year, "stars": set()}
+            for movie_id, title, year in movie_rows
+        }
+        for person_id, movie_id in star_rows:
+            people[person_id]["movies"].add(movie_id)
+            movies[movie_id]["stars"].add(person_id)
+        return cls(people, movies, cache_size)
+
+    def neighbors(self, person_id):
+        """
+        Yields (movie_id, person_id) pairs for people who starred
+        with a given person.
+        """
+        for movie_id in self.people[person_id]["movies"]:
+            for neighbor in self.movies[movie_id]["stars"]:
+                yield movie_id, neighbor
+
+    def all_trees(self):
+        return list(self.trees.values()) + list(self.landmarks.values())
+
+    def add_person(self, person_id, name, birth=""):
+        self.people[person_id] = {"name": name, "birth": birth, "movies": set()}
+        self.names.setdefault(name.lower(), set()).add(person_id)
+
+    def add_movie(self, movie_id, title, year="", stars=()):
+        """
+        Adds a movie, starring the people in `stars`.
+        """
+        self.movies[movie_id] = {"title": title, "year": year, "stars": set()}
+        for person_id in stars:
+            self.add_star(person_id, movie_id)
+
+    def add_star(self, person_id, movie_id):
+        """
+        Casts an existing person in an existing movie.
+        """
+        stars = self.movies[movie_id]["stars"]
+        if person_id in stars:
+            return
+        edges = [(person_id, movie_id, other) for other in stars]
+        stars.add(person_id)
+        self.people[person_id]["movies"].add(movie_id)
+        for tree in self.all_trees():
+            tree.edges_added(edges)
+
+    def remove_star(self, person_id, movie_id):
+        """
+        Removes a person from a movie's cast.
+        """
+        stars = self.movies[movie_id]["stars"]
+        cast = set(stars)
+        stars.discard(person_id)
+        self.people[person_id]["movies"].discard(movie_id)
+
+        # Steps from the person through the movie, or into them through it
+        def removed(person, step):
+            parent, movie = step
+            return movie == movie_id and person_id in (person, parent)
+
+        for tree in self.all_trees():
+            tree.edges_removed(cast, removed)
+
+    def remove_movie(self, movie_id):
+        """
+        Removes a movie and every edge it provided.
+        """
+        movie = self.movies.pop(movie_id)
+        for person_id in movie["stars"]:
+            self.people[person_id]["movies"].discard(movie_id)
+        for tree in self.all_trees():
+            tree.edges_removed(movie["stars"], lambda person, step: step[1] == movie_id)
+
+    def tree(self, person_id):
+        """
+        Returns the cached tree rooted at `person_id`, building it and
+        evicting the least recently used tree if needed.
+        """
+        if person_id in self.landmarks:
+            return self.landmarks[person_id]
+        tree = self.trees.get(person_id)
+        if tree is None:
+            tree = DistanceTree(person_id, self.neighbors)
+            self.trees[person_id] = tree
+            if len(self.trees) > self.cache_size:
+                self.trees.popitem(last=False)
+        else:
+            self.trees.move_to_end(person_id)
+        return tree
+
+    def add_landmarks(self, count):
+        """
+        Keeps trees for the `count` people with the most movies.
+        """
+        ranked = sorted(self.people, key=lambda person_id: -len(self.people[person_id]["movies"]))
+        for person_id in ranked[:count]:
+            self.landmarks[person_id] = DistanceTree(person_id, self.neighbors)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation from
+        the landmark trees, with upper None if no landmark gives one,
+        or None if some landmark shows the two are not connected.
+        """
+        lower = 0
+        upper = None
+        for tree in self.landmarks.values():
+            a = tree.distance.get(source)
+            b = tree.distance.get(target)
+            if a is None and b is None:
+                continue
+            if a is None or b is None:
+                return None
+            lower = max(lower, abs(a - b))
+            upper = a + b if upper is None else min(upper, a + b)
+        return lower, upper
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs that
+        connect the source to the target, or None.
+
+        Reads the path off a cached tree for either end when there is
+        one, and otherwise searches without caching.
+        """
+        for root, other, flip in ((source, target, False), (target, source, True)):
+            tree = self.trees.get(root) or self.landmarks.get(root)
+            if tree is not None:
+                path = tree.path_to(other)
+                if path is None or not flip:
+                    return path
+                return reverse_path(path, target)
+        if self.bounds(source, target) is None:
+            return None
+        return restricted_path(source, target, self.neighbors, set(), set())
+
+    def distance(self, source, target):
+        """
+        Returns the degrees of separation between two people, or None.
+        """
+        bounds = self.bounds(source, target)
+        if bounds is None:
+            return None
+        if bounds[0] == bounds[1]:
+            return bounds[0]
+        path = self.tree(source).path_to(target)
+        return None if path is None else len(path)
+
+
+def reverse_path(path, start):
+    """
+    Turns around a (movie_id, person_id) path leading away from `start`,
+    so that it leads to `start` instead.
+    """
+    people = [start] + [person_id for _, person_id in path[:-1]]
+    movies = [movie_id for movie_id, _ in path]
+    reversed_path = list(zip(movies, people))
+    reversed_path.reverse()
+    return reversed_path
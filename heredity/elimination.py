@@ -0,0 +1,195 @@
+import itertools
+
+from heredity import PROBS, inheritance_probability, normalize
+
+GENES = (0, 1, 2)
+
+
+class Factor():
+    """
+    Function of some people's gene counts, stored as a table.
+
+    `variables` is a tuple of names, and `values` maps every tuple of
+    their gene counts, in the same order, to a number.
+    """
+
+    def __init__(self, variables, values):
+        self.variables = variables
+        self.values = values
+
+    def multiply(self, other):
+        """
+        Returns the pointwise product of two factors.
+        """
+        variables = self.variables + tuple(
+            v for v in other.variables if v not in self.variables
+        )
+        mine = [variables.index(v) for v in self.variables]
+        theirs = [variables.index(v) for v in other.variables]
+        values = {}
+        for genes in itertools.product(GENES, repeat=len(variables)):
+            values[genes] = (
+                self.values[tuple(genes[i] for i in mine)] *
+                other.values[tuple(genes[i] for i in theirs)]
+            )
+        return Factor(variables, values)
+
+    def marginal(self, variables):
+        """
+        Returns the factor summed over every variable not in `variables`.
+        """
+        keep = [self.variables.index(v) for v in variables]
+        values = dict.fromkeys(itertools.product(GENES, repeat=len(keep)), 0)
+        for genes, value in self.values.items():
+            values[tuple(genes[i] for i in keep)] += value
+        return Factor(tuple(variables), values)
+
+    def scaled(self):
+        """
+        Returns the factor scaled to sum to 1, so that long chains of
+        products do not underflow. Only the ratios between entries are
+        needed, so the scale is never kept.
+        """
+        total = sum(self.values.values())
+        if not total:
+            return self
+        return Factor(self.variables, {
+            genes: value / total for genes, value in self.values.items()
+        })
+
+    def divide(self, other):
+        """
+        Returns this factor divided by one over a subset of its
+        variables, taking 0 / 0 to be 0.
+        """
+        theirs = [self.variables.index(v) for v in other.variables]
+        values = {}
+        for genes, value in self.values.items():
+            divisor = other.values[tuple(genes[i] for i in theirs)]
+            values[genes] = value / divisor if divisor else 0
+        return Factor(self.variables, values)
+
+
+def pedigree_factors(people):
+    """
+    Compiles people as returned by `load_data` into one factor per
+    person: their gene prior or inheritance table, times the chance of
+    their trait where it is known.
+
+    Unknown traits sum to 1 over both values, so they leave no factor.
+    """
+    factors = []
+    for person in people:
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        trait = people[person]["trait"]
+
+        if mother is None and father is None:
+            variables = (person,)
+            values = {(g,): PROBS["gene"][g] for g in GENES}
+        else:
+            variables = (person, mother, father)
+            values = {
+                (g, m, f): inheritance_probability(g, m, f)
+                for g, m, f in itertools.product(GENES, repeat=3)
+            }
+
+        if trait is not None:
+            for genes in values:
+                values[genes] *= PROBS["trait"][genes[0]][trait]
+        factors.append(Factor(variables, values))
+    return factors
+
+
+def min_fill_order(factors):
+    """
+    Returns an elimination order for the variables of `factors`, always
+    eliminating next the variable whose neighbors need the fewest new
+    edges to become a clique, with ties broken by fewest neighbors and
+    then by name.
+    """
+    neighbors = {}
+    for factor in factors:
+        for v in factor.variables:
+            neighbors.setdefault(v, set()).update(
+                u for u in factor.variables if u != v
+            )
+
+    def fill(v):
+        adjacent = list(neighbors[v])
+        missing = sum(
+            1 for a, b in itertools.combinations(adjacent, 2)
+            if b not in neighbors[a]
+        )
+        return missing, len(adjacent), v
+
+    order = []
+    while neighbors:
+        v = min(neighbors, key=fill)
+        adjacent = neighbors.pop(v)
+        for u in adjacent:
+            neighbors[u].discard(v)
+            neighbors[u].update(adjacent - {u})
+        order.append(v)
+    return order
+
+
+def variable_elimination(people):
+    """
+    Returns the same "gene" and "trait" distributions for every person
+    as enumerating every assignment in `main`, by variable elimination.
+
+    Eliminating in min-fill order keeps every table over only a few
+    people, so the cost grows with the size of the pedigree rather
+    than exponentially in it. Eliminating a person leaves a bucket
+    holding everything multiplied together for them. A second pass
+    back down the order passes each bucket the evidence from the rest
+    of the pedigree, after which each bucket holds its people's joint
+    distribution, unnormalized.
+    """
+    factors = pedigree_factors(people)
+    order = min_fill_order(factors)
+    position = {v: i for i, v in enumerate(order)}
+
+    # Each factor waits in the bucket of its first eliminated variable
+    waiting = {v: [] for v in order}
+    for factor in factors:
+        first = min(factor.variables, key=position.get)
+        waiting[first].append(factor)
+
+    # Eliminates variables in order, sending each message onwards
+    buckets = {}
+    messages = {}
+    parent = {}
+    for v in order:
+        bucket, *others = waiting.pop(v)
+        for factor in others:
+            bucket = bucket.multiply(factor)
+        buckets[v] = bucket
+        rest = [u for u in bucket.variables if u != v]
+        messages[v] = bucket.marginal(rest).scaled()
+        if rest:
+            parent[v] = min(rest, key=position.get)
+            waiting[parent[v]].append(messages[v])
+
+    # Passes evidence from the rest of the pedigree back down
+    for v in reversed(order):
+        if v in parent:
+            above = buckets[parent[v]].marginal(messages[v].variables)
+            buckets[v] = buckets[v].multiply(above.divide(messages[v]))
+
+    probabilities = {}
+    for person in people:
+        genes = buckets[person].marginal((person,)).values
+        trait = people[person]["trait"]
+        total = sum(genes.values())
+        if trait is None:
+            have = sum(genes[(g,)] * PROBS["trait"][g][True] for g in GENES)
+        else:
+            have = total if trait else 0
+        probabilities[person] = {
+            "gene": {g: genes[(g,)] for g in (2, 1, 0)},
+            "trait": {True: have, False: total - have}
+        }
+    normalize(probabilities)
+    return probabilities
@@ -1,6 +1,8 @@
+import argparse
 import csv
 import itertools
-import sys
+import math
+from concurrent.futures import ProcessPoolExecutor
 
 PROBS = {
 
@@ -36,41 +38,74 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Ways of computing the probabilities, chosen with --engine
+ENGINES = ["enumerate", "elimination", "batched", "pruned", "parallel"]
+
+# Assignments evaluated at once by batched_probabilities
+BLOCK_SIZE = 4096
+
+# Partial joint probability below which pruned_assignments abandons a branch
+THRESHOLD = 0
+
+# Trait subsets enumerated per task by parallel_probabilities
+SHARD_SIZE = 4
+
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("data", help="CSV file of the family")
+    parser.add_argument("--engine", choices=ENGINES, default="enumerate",
+                        help="how the probabilities are computed")
+    parser.add_argument("--workers", type=int,
+                        help="processes used by the parallel engine")
+    parser.add_argument("--log", action="store_true",
+                        help="work with log probabilities, which do not underflow "
+                             "(elimination rescales instead, and ignores this)")
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    if args.engine == "elimination":
+        from elimination import variable_elimination
+        probabilities = variable_elimination(people)
+    elif args.engine == "batched":
+        probabilities = batched_probabilities(people, log_space=args.log)
+    elif args.engine == "pruned":
+        probabilities = pruned_probabilities(people, log_space=args.log)
+    elif args.engine == "parallel":
+        probabilities = parallel_probabilities(people, args.workers, log_space=args.log)
+    else:
+        probabilities = enumerate_probabilities(people, args.log)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+
+
+def enumerate_probabilities(people, log_space=False):
+    """
+    Return the "gene" and "trait" distributions of every person by
+    enumerating every assignment of genes and traits, weighting each
+    by its joint probability.
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    With `log_space`, joint probabilities are kept as logarithms and
+    summed with log-sum-exp, so they cannot underflow.
+    """
+    empty, joint, add, finish = arithmetic(log_space)
 
     # Keep track of gene and trait probabilities for each person
-    probabilities = {
-        person: {
-            "gene": {
-                2: 0,
-                1: 0,
-                0: 0
-            },
-            "trait": {
-                True: 0,
-                False: 0
-            }
-        }
-        for person in people
-    }
+    probabilities = empty(people)
 
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
 
         # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
+        if fails_evidence(people, have_trait):
             continue
 
         # Loop over all sets of people who might have the gene
@@ -78,20 +113,285 @@ def main():
             for two_genes in powerset(names - one_gene):
 
                 # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+                p = joint(people, one_gene, two_genes, have_trait)
+                add(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
-    normalize(probabilities)
+    finish(probabilities)
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
+
+
+def batched_probabilities(people, block_size=BLOCK_SIZE, log_space=False):
+    """
+    Return the same distributions as `enumerate_probabilities`, with
+    the same rounding, evaluating joint probabilities for up to
+    `block_size` assignments at a time as NumPy arrays.
+
+    Each gene assignment is a row of gene counts, one per person, in
+    the order the enumeration visits them. Every person's factor of the
+    joint probability is looked up from a table of the products
+    `joint_probability` would form, and the factors are multiplied
+    person by person in the same order. `numpy.add.at` then adds each
+    probability in turn, so the sums are rounded exactly as `update`
+    rounds them. With `log_space`, logarithms of the factors are added
+    instead and `numpy.logaddexp.at` accumulates them.
+
+    Requires NumPy.
+    """
+    import numpy
+
+    order = list(people)
+    column = {person: i for i, person in enumerate(order)}
+    names = set(people)
+
+    # Gene counts of everyone, for every assignment the enumeration visits
+    genes = numpy.array([
+        [find_num_genes(person, one_gene, two_genes) for person in order]
+        for one_gene in powerset(names)
+        for two_genes in powerset(names - one_gene)
+    ], dtype=numpy.intp).reshape(-1, len(order))
+
+    # Factor of each person given their genes, their parents' and their trait
+    tables = numpy.zeros((len(order), 3, 3, 3, 2))
+    mothers = []
+    fathers = []
+    for i, person in enumerate(order):
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        mothers.append(column.get(mother, i))
+        fathers.append(column.get(father, i))
+        for num_genes, m, f, trait in itertools.product(
+            range(3), range(3), range(3), (False, True)
+        ):
+            if mother is None and father is None:
+                gene = PROBS["gene"][num_genes]
+            else:
+                gene = inheritance_probability(num_genes, m, f)
+            tables[i, num_genes, m, f, int(trait)] = gene * PROBS["trait"][num_genes][trait]
+
+    if log_space:
+        with numpy.errstate(divide="ignore"):
+            tables = numpy.log(tables)
+        combine = numpy.add
+        accumulate = numpy.logaddexp
+    else:
+        combine = numpy.multiply
+        accumulate = numpy.add
+    empty, _, _, finish = arithmetic(log_space)
+    start_value = float(empty_value(log_space))
+
+    gene_totals = numpy.full((len(order), 3), start_value)
+    trait_totals = numpy.full((len(order), 2), start_value)
+    for have_trait in powerset(names):
+        if fails_evidence(people, have_trait):
+            continue
+        traits = [int(person in have_trait) for person in order]
+
+        for start in range(0, len(genes), block_size):
+            block = genes[start:start + block_size]
+            p = numpy.full(len(block), 0.0 if log_space else 1.0)
+            for i in range(len(order)):
+                p = combine(p, tables[i, block[:, i], block[:, mothers[i]],
+                                      block[:, fathers[i]], traits[i]])
+            for i in range(len(order)):
+                accumulate.at(gene_totals[i], block[:, i], p)
+                accumulate.at(trait_totals[i], numpy.full(len(block), traits[i]), p)
+
+    probabilities = empty(people)
+    for i, person in enumerate(order):
+        for num_genes in range(3):
+            probabilities[person]["gene"][num_genes] = float(gene_totals[i, num_genes])
+        for trait in (False, True):
+            probabilities[person]["trait"][trait] = float(trait_totals[i, int(trait)])
+    finish(probabilities)
+
+    return probabilities
+
+
+def pruned_probabilities(people, threshold=THRESHOLD, log_space=False):
+    """
+    Return the same distributions as `enumerate_probabilities`, from
+    the assignments `pruned_assignments` yields.
+    """
+    empty, _, add, finish = arithmetic(log_space)
+    probabilities = empty(people)
+    assignments = pruned_assignments(people, threshold, log_space)
+    for one_gene, two_genes, have_trait, p in assignments:
+        add(probabilities, one_gene, two_genes, have_trait, p)
+    finish(probabilities)
+    return probabilities
+
+
+def pruned_assignments(people, threshold=THRESHOLD, log_space=False):
+    """
+    Yield (one_gene, two_genes, have_trait, p) for every assignment of
+    genes and traits consistent with the known traits, with `p` its
+    joint probability.
+
+    People are assigned founders first, so everyone's factor of the
+    joint probability is known as soon as they are, and each partial
+    product is shared by every assignment that extends it. A known
+    trait is assigned only its known value. Factors are at most 1, so
+    a branch whose partial product falls below `threshold` can only
+    lead to assignments below it too, and is abandoned.
+
+    With `log_space`, `p` is the logarithm of the joint probability,
+    built up as a sum, while `threshold` is still a probability.
+    """
+    if log_space:
+        cutoff = log_probability(threshold)
+    else:
+        cutoff = threshold
+    order = topological_order(people)
+    genes = {}
+    traits = {}
+
+    def extend(depth, partial):
+        if depth == len(order):
+            one_gene = {person for person in order if genes[person] == 1}
+            two_genes = {person for person in order if genes[person] == 2}
+            have_trait = {person for person in order if traits[person]}
+            yield one_gene, two_genes, have_trait, partial
+            return
+
+        person = order[depth]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        known = people[person]["trait"]
+        for num_genes in (0, 1, 2):
+            if mother is None and father is None:
+                gene = PROBS["gene"][num_genes]
+            else:
+                gene = inheritance_probability(num_genes, genes[mother], genes[father])
+            genes[person] = num_genes
+
+            for trait in ((False, True) if known is None else (known,)):
+                factor = gene * PROBS["trait"][num_genes][trait]
+                if log_space:
+                    p = partial + log_probability(factor)
+                else:
+                    p = partial * factor
+                if p < cutoff or p == empty_value(log_space):
+                    continue
+                traits[person] = trait
+                yield from extend(depth + 1, p)
+
+    yield from extend(0, 0 if log_space else 1)
+
+
+def topological_order(people):
+    """
+    Return the names of `people` ordered so that everyone comes after
+    their parents, founders first.
+    """
+    order = []
+    placed = set()
+    remaining = list(people)
+    while remaining:
+        waiting = []
+        for person in remaining:
+            parents = {people[person]["mother"], people[person]["father"]} - {None}
+            if parents <= placed:
+                order.append(person)
+                placed.add(person)
+            else:
+                waiting.append(person)
+        if len(waiting) == len(remaining):
+            raise ValueError("family tree has a cycle")
+        remaining = waiting
+    return order
+
+
+def parallel_probabilities(people, workers=None, shard_size=SHARD_SIZE, log_space=False):
+    """
+    Return the same distributions as `enumerate_probabilities`, with
+    the trait subsets shared out in shards of `shard_size` over a pool
+    of `workers` processes.
+
+    Each shard's unnormalized totals are added up in shard order before
+    normalizing. Subsets are listed from the names in sorted order, and
+    shards do not depend on the number of workers, so the results are
+    the same however many there are. With `log_space`, the totals are
+    logarithms and are added with log-sum-exp.
+    """
+    empty, _, _, finish = arithmetic(log_space)
+    names = sorted(people)
+    subsets = [
+        have_trait for have_trait in powerset(names)
+        if not fails_evidence(people, have_trait)
+    ]
+    shards = [
+        subsets[i:i + shard_size] for i in range(0, len(subsets), shard_size)
+    ]
+
+    probabilities = empty(people)
+    with ProcessPoolExecutor(workers) as executor:
+        partials = executor.map(
+            enumerate_shard, [people] * len(shards), shards, [log_space] * len(shards)
+        )
+        for partial in partials:
+            for person in probabilities:
+                for field in probabilities[person]:
+                    totals = probabilities[person][field]
+                    for value in totals:
+                        if log_space:
+                            totals[value] = log_add(totals[value], partial[person][field][value])
+                        else:
+                            totals[value] += partial[person][field][value]
+
+    finish(probabilities)
+    return probabilities
+
+
+def enumerate_shard(people, subsets, log_space=False):
+    """
+    Return the unnormalized "gene" and "trait" totals of every person
+    over every gene assignment, for each set of people with the trait
+    in `subsets`.
+    """
+    empty, joint, add, _ = arithmetic(log_space)
+    names = sorted(people)
+    probabilities = empty(people)
+    for have_trait in subsets:
+        for one_gene in powerset(names):
+            for two_genes in powerset(sorted(set(names) - one_gene)):
+                p = joint(people, one_gene, two_genes, have_trait)
+                add(probabilities, one_gene, two_genes, have_trait, p)
+    return probabilities
+
+
+def empty_probabilities(people, value=0):
+    """
+    Return "gene" and "trait" distributions of zeros for every person,
+    or of `value`.
+    """
+    return {
+        person: {
+            "gene": {
+                2: value,
+                1: value,
+                0: value
+            },
+            "trait": {
+                True: value,
+                False: value
+            }
+        }
+        for person in people
+    }
+
+
+def fails_evidence(people, have_trait):
+    """
+    Return whether the set of people `have_trait` contradicts any
+    trait known from the data.
+    """
+    return any(
+        (people[person]["trait"] is not None and
+         people[person]["trait"] != (person in have_trait))
+        for person in people
+    )
 
 
 def load_data(filename):
@@ -165,6 +465,23 @@ def find_parents_probability(num_genes, trait_value):
     return probabilities[trait_value][num_genes]
 
 
+def inheritance_probability(num_genes, mother_num_genes, father_num_genes):
+    """
+    Return the probability a child has `num_genes` copies of the gene
+    given how many copies each of their parents has.
+    """
+    # for child having 0 genes (gets it from neither parent)
+    if num_genes == 0:
+        return find_parents_probability(mother_num_genes, False) * find_parents_probability(father_num_genes, False)
+
+    # for child having 1 genes (gets it from one parent)
+    elif num_genes == 1:
+        return find_parents_probability(mother_num_genes, True) * find_parents_probability(father_num_genes, False) + find_parents_probability(mother_num_genes, False) * find_parents_probability(father_num_genes, True)
+
+    # for child having 2 genes (gets it from both parent)
+    return find_parents_probability(mother_num_genes, True) * find_parents_probability(father_num_genes, True)
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -199,18 +516,9 @@ def joint_probability(people, one_gene, two_genes, have_trait):
             mother_num_genes = find_num_genes(people[person]["mother"], one_gene, two_genes)
             father_num_genes = find_num_genes(people[person]["father"], one_gene, two_genes)
 
-            # for child having 0 genes (gets it from neither parent)
-            if num_genes == 0:
-                placeholder = find_parents_probability(mother_num_genes, False) * find_parents_probability(father_num_genes, False)       
-            
-            # for child having 1 genes (gets it from one parent)
-            elif num_genes == 1:
-                placeholder = find_parents_probability(mother_num_genes, True) * find_parents_probability(father_num_genes, False) + find_parents_probability(mother_num_genes, False) * find_parents_probability(father_num_genes, True)
-
-            # for child having 2 genes (gets it from both parent)
-            elif num_genes == 2:
-                placeholder = find_parents_probability(mother_num_genes, True) * find_parents_probability(father_num_genes, True)
-         
+            # probability of child's genes given their parents'
+            placeholder = inheritance_probability(num_genes, mother_num_genes, father_num_genes)
+
             # multiplies by probability for trait given number of genes
             probability *= (placeholder * PROBS["trait"][num_genes][trait])
 
@@ -261,5 +569,106 @@ def normalize(probabilities):
             probabilities[person]["trait"][value] *= a
 
 
+def arithmetic(log_space):
+    """
+    Return the functions an engine accumulates probabilities with:
+    one making empty totals for some people, one computing a joint
+    probability, one adding it to the totals and one normalizing them.
+    With `log_space`, the log-space versions are returned.
+    """
+    if log_space:
+        return empty_log_probabilities, log_joint_probability, log_update, log_normalize
+    return empty_probabilities, joint_probability, update, normalize
+
+
+def empty_value(log_space):
+    """
+    Return how a probability of 0 is written, in log space or not.
+    """
+    return -math.inf if log_space else 0
+
+
+def log_probability(p):
+    """
+    Return the natural logarithm of probability `p`, -inf for 0.
+    """
+    return math.log(p) if p > 0 else -math.inf
+
+
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving log space.
+    """
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
+def empty_log_probabilities(people):
+    """
+    Return "gene" and "trait" distributions of log probability -inf,
+    which is 0, for every person.
+    """
+    return empty_probabilities(people, -math.inf)
+
+
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Compute the logarithm of `joint_probability` as a sum of the
+    logarithms of its factors, so it does not underflow however many
+    people there are.
+    """
+    log_p = 0
+    for person in people:
+        num_genes = find_num_genes(person, one_gene, two_genes)
+        trait = person in have_trait
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+
+        if mother is None and father is None:
+            gene = PROBS["gene"][num_genes]
+        else:
+            gene = inheritance_probability(
+                num_genes,
+                find_num_genes(mother, one_gene, two_genes),
+                find_num_genes(father, one_gene, two_genes)
+            )
+        log_p += log_probability(gene) + log_probability(PROBS["trait"][num_genes][trait])
+
+    return log_p
+
+
+def log_update(probabilities, one_gene, two_genes, have_trait, log_p):
+    """
+    Same as `update`, for log probabilities `probabilities` and `log_p`.
+    """
+    for person in probabilities:
+        num_genes = find_num_genes(person, one_gene, two_genes)
+        trait = person in have_trait
+        genes = probabilities[person]["gene"]
+        traits = probabilities[person]["trait"]
+        genes[num_genes] = log_add(genes[num_genes], log_p)
+        traits[trait] = log_add(traits[trait], log_p)
+
+
+def log_normalize(probabilities):
+    """
+    Turn log probabilities `probabilities` into normalized probabilities,
+    dividing by each distribution's total in log space.
+    """
+    for person in probabilities:
+        for field in probabilities[person]:
+            distribution = probabilities[person][field]
+            total = -math.inf
+            for value in distribution:
+                total = log_add(total, distribution[value])
+            if total == -math.inf:
+                raise ValueError(f"no assignment is possible for {person}")
+            for value in distribution:
+                distribution[value] = math.exp(distribution[value] - total)
+
+
 if __name__ == "__main__":
     main()
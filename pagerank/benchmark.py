@@ -0,0 +1,212 @@
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from graph import graph_from_edges
+from montecarlo import CHAINS, multichain_pagerank
+from outofcore import edge_file_pagerank, save_edges
+from pagerank import (
+    DAMPING, SAMPLES, TOLERANCE, MAX_ITERATIONS,
+    power_iteration, python_power_iteration, sample_pagerank,
+    vectorized_sample_pagerank
+)
+
+ENGINES = ["iterate", "python", "outofcore", "sample", "vectorized", "multichain"]
+
+# Largest graph the reference is solved for directly, as a dense system
+EXACT_LIMIT = 4000
+
+FIELDS = [
+    "label", "engine", "pages", "links", "seconds", "iterations", "samples",
+    "peak_kib", "l1_error", "max_error"
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time PageRank engines and measure their error on a synthetic web graph."
+    )
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--links", type=float, default=8,
+                        help="mean links per page that has any")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Zipf exponent of how often each page is linked to")
+    parser.add_argument("--dangling", type=float, default=0.1,
+                        help="share of pages with no links")
+    parser.add_argument("--cycles", type=int, default=10,
+                        help="number of extra link cycles through random pages")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--output", default="benchmark.csv",
+                        help="CSV file results are appended to")
+    parser.add_argument("--label", default="",
+                        help="tag for the rows, such as a version")
+    args = parser.parse_args()
+
+    graph = generate_graph(
+        args.pages, args.links, args.skew, args.dangling, args.cycles, args.seed
+    )
+    reference = exact_pagerank(graph, DAMPING)
+
+    print(f"{'engine':<12} {'seconds':>9} {'rounds':>8} {'samples':>9} "
+          f"{'peak KiB':>10} {'L1 error':>10} {'max error':>10}")
+    rows = []
+    for engine in args.engines:
+        result = run_engine(graph, engine, reference, args.samples, args.seed)
+        result.update(label=args.label, engine=engine, pages=graph.page_count(),
+                      links=len(graph.links))
+        rows.append(result)
+        print(f"{engine:<12} {result['seconds']:>9.4f} {result['iterations']:>8} "
+              f"{result['samples']:>9} {result['peak_kib']:>10.1f} "
+              f"{result['l1_error']:>10.2e} {result['max_error']:>10.2e}")
+
+    write_results(args.output, rows)
+
+
+def generate_graph(pages, links, skew=1.0, dangling=0.1, cycles=10, seed=0):
+    """
+    Returns a random LinkGraph of `pages` pages.
+
+    A `dangling` share of pages has no links. The others link to
+    `links` pages on average, with the chance of linking to the page
+    ranked `r` proportional to 1 / r ** `skew`, so a few pages are
+    linked to from everywhere and most hardly at all. Out-degrees are
+    skewed too. Each of the `cycles` cycles links a random run of pages
+    in a loop, dangling pages left out.
+    """
+    rng = random.Random(seed)
+    names = [f"{page}.html" for page in range(pages)]
+
+    # Ranks pages by popularity in a random order of ids
+    order = list(range(pages))
+    rng.shuffle(order)
+    cumulative = []
+    total = 0
+    for rank in range(pages):
+        total += 1 / (rank + 1) ** skew
+        cumulative.append(total)
+
+    linking = [page for page in range(pages) if rng.random() >= dangling]
+    edges = []
+    for page in linking:
+        degree = min(pages - 1, max(1, round(rng.paretovariate(2) * links / 2)))
+        ranks = rng.choices(range(pages), cum_weights=cumulative, k=degree)
+        edges.extend((page, order[rank]) for rank in ranks)
+
+    for _ in range(cycles if len(linking) > 1 else 0):
+        loop = rng.sample(linking, rng.randint(2, min(len(linking), 10)))
+        edges.extend(zip(loop, loop[1:] + loop[:1]))
+
+    return graph_from_edges(names, edges)
+
+
+def exact_pagerank(graph, damping_factor):
+    """
+    Returns the PageRank of every page in a LinkGraph, solved directly
+    as a linear system with NumPy.
+
+    Graphs over EXACT_LIMIT pages are too large for a dense solve, so
+    power iteration is run almost to machine precision instead.
+    """
+    N = graph.page_count()
+    if N > EXACT_LIMIT:
+        ranks, _ = power_iteration(graph, damping_factor, 1e-15, 100 * MAX_ITERATIONS)
+        return ranks
+
+    import numpy
+
+    # Column j holds the chance of moving from page j to every page
+    transitions = numpy.zeros((N, N))
+    for page in range(N):
+        degree = graph.out_degree(page)
+        if degree == 0:
+            transitions[:, page] = 1 / N
+        for link in graph.outlinks(page):
+            transitions[link, page] += 1 / degree
+
+    system = numpy.eye(N) - damping_factor * transitions
+    ranks = numpy.linalg.solve(system, numpy.full(N, (1 - damping_factor) / N))
+    return (ranks / ranks.sum()).tolist()
+
+
+def run_engine(graph, engine, reference, samples, seed=0):
+    """
+    Runs `engine` on a LinkGraph, and returns its wall time, the
+    rounds or samples it took, the peak memory traced while it ran and
+    its L1 and largest error against the `reference` ranks.
+    """
+    start = time.perf_counter()
+    ranks, iterations, taken = rank(graph, engine, samples, seed)
+    seconds = time.perf_counter() - start
+
+    # Memory is traced in a second run so tracing does not skew the timing.
+    # Memory used by multichain's worker processes is not seen.
+    tracemalloc.start()
+    rank(graph, engine, samples, seed)
+    memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    errors = [abs(a - b) for a, b in zip(ranks, reference)]
+    return {
+        "seconds": seconds,
+        "iterations": iterations,
+        "samples": taken,
+        "peak_kib": memory / 1024,
+        "l1_error": sum(errors),
+        "max_error": max(errors, default=0)
+    }
+
+
+def rank(graph, engine, samples, seed=0):
+    """
+    Returns the ranks `engine` gives each page of a LinkGraph, in page
+    order, along with the rounds it ran and samples it took.
+    """
+    if engine == "iterate":
+        ranks, iterations = power_iteration(graph, DAMPING, TOLERANCE)
+        return ranks, iterations, 0
+    if engine == "python":
+        ranks, iterations = python_power_iteration(
+            graph, DAMPING, TOLERANCE, MAX_ITERATIONS, None
+        )
+        return ranks, iterations, 0
+    if engine == "outofcore":
+        # Writing the edge file is timed along with the ranking
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "edges")
+            save_edges(graph, path)
+            ranks, iterations = edge_file_pagerank(path, DAMPING, TOLERANCE)
+        return ranks.tolist(), iterations, 0
+
+    if engine == "sample":
+        ranks = sample_pagerank(graph, DAMPING, samples)
+    elif engine == "vectorized":
+        ranks = vectorized_sample_pagerank(graph, DAMPING, samples, seed=seed)
+    else:
+        steps = max(1, samples // CHAINS)
+        ranks, _ = multichain_pagerank(graph, DAMPING, steps=steps, seed=seed)
+        samples = steps * CHAINS
+    return [ranks[page] for page in graph.pages], 0, samples
+
+
+def write_results(path, rows):
+    """
+    Appends result rows to the CSV file at `path`, writing a header
+    first if the file is new.
+    """
+    new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        if new:
+            writer.writeheader()
+        for row in rows:
+            writer.writerow({field: row[field] for field in FIELDS})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from graph import graph_from_edges
+
+# Same pattern as pagerank.crawl
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+CHUNK_SIZE = 1 << 16
+THREADS = 8
+
+# An unfinished tag longer than this at a chunk boundary is dropped
+MAX_TAIL = 1 << 20
+
+
+def crawl_graph(directory, threads=THREADS, chunk_size=CHUNK_SIZE):
+    """
+    Parse a directory of HTML pages into a LinkGraph, reading the files
+    on a pool of `threads` threads.
+
+    Pages are numbered in sorted order of their names before any file is
+    read, so links are interned to ids as they are found and only links
+    to other pages in the corpus are ever stored.
+    """
+    pages = sorted(
+        entry.name for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.endswith(".html")
+    )
+    index = {page: i for i, page in enumerate(pages)}
+
+    def read(page):
+        return index[page], page_links(
+            os.path.join(directory, page), index, chunk_size
+        )
+
+    with ThreadPoolExecutor(threads) as pool:
+        edges = (
+            (source, target)
+            for source, targets in pool.map(read, pages)
+            for target in targets
+        )
+        return graph_from_edges(pages, edges)
+
+
+def page_links(path, index, chunk_size=CHUNK_SIZE):
+    """
+    Returns the ids in `index` of every page linked to by the HTML file
+    at `path`, reading it `chunk_size` characters at a time.
+    """
+    links = set()
+    tail = ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            text = tail + chunk
+
+            end = 0
+            for match in LINK.finditer(text):
+                link = index.get(match.group(1))
+                if link is not None:
+                    links.add(link)
+                end = match.end()
+
+            # Carries an unfinished tag over into the next chunk
+            opening = text.rfind("<", end)
+            if opening != -1 and ">" not in text[opening:] and len(text) - opening <= MAX_TAIL:
+                tail = text[opening:]
+            else:
+                tail = ""
+    return links
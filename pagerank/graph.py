@@ -0,0 +1,111 @@
+import os
+import struct
+import sys
+from array import array
+
+
+class LinkGraph():
+    """
+    Corpus of pages with dense integer ids and CSR-style outlinks.
+
+    The pages page `i` links to are
+    `links[start[i]:start[i + 1]]`, as indices into `pages`.
+    """
+
+    def __init__(self, pages, start, links):
+        self.pages = pages
+        self.start = start
+        self.links = links
+
+    def page_count(self):
+        return len(self.pages)
+
+    def outlinks(self, page):
+        return self.links[self.start[page]:self.start[page + 1]]
+
+    def out_degree(self, page):
+        return self.start[page + 1] - self.start[page]
+
+
+def link_graph(corpus):
+    """
+    Returns a LinkGraph of a corpus dictionary as returned by `crawl`,
+    with pages numbered in sorted order of their names.
+    A LinkGraph is returned as it is.
+    """
+    if isinstance(corpus, LinkGraph):
+        return corpus
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    start = array("I", [0])
+    links = array("I")
+    for page in pages:
+        links.extend(sorted(index[link] for link in corpus[page] if link in index))
+        start.append(len(links))
+    return LinkGraph(pages, start, links)
+
+
+def graph_from_edges(pages, edges):
+    """
+    Returns a LinkGraph of `pages` from (source, target) index pairs,
+    ignoring repeated edges and self-links.
+    """
+    outlinks = [set() for _ in pages]
+    for source, target in edges:
+        if source != target:
+            outlinks[source].add(target)
+    start = array("I", [0])
+    links = array("I")
+    for targets in outlinks:
+        links.extend(sorted(targets))
+        start.append(len(links))
+    return LinkGraph(pages, start, links)
+
+
+# Saved graph layout: magic, page count, link count, name bytes,
+# then the names (newline-separated), offsets and links
+GRAPH_MAGIC = b"PRGRAPH1"
+GRAPH_HEADER = struct.Struct("<8sQQQ")
+
+
+def save_graph(graph, path):
+    """
+    Write `graph` to `path` in a compact binary form.
+    """
+    names = "\n".join(graph.pages).encode("utf-8")
+    start = array("I", graph.start)
+    links = array("I", graph.links)
+    if sys.byteorder != "little":
+        start.byteswap()
+        links.byteswap()
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(GRAPH_HEADER.pack(GRAPH_MAGIC, len(graph.pages), len(links), len(names)))
+        f.write(names)
+        start.tofile(f)
+        links.tofile(f)
+    os.replace(temporary, path)
+
+
+def load_graph(path):
+    """
+    Read a LinkGraph written by `save_graph`.
+    """
+    with open(path, "rb") as f:
+        magic, count, link_count, name_size = GRAPH_HEADER.unpack(
+            f.read(GRAPH_HEADER.size)
+        )
+        if magic != GRAPH_MAGIC:
+            raise ValueError(f"{path} is not a saved link graph")
+        names = f.read(name_size).decode("utf-8")
+        start = array("I")
+        start.fromfile(f, count + 1)
+        links = array("I")
+        links.fromfile(f, link_count)
+    if sys.byteorder != "little":
+        start.byteswap()
+        links.byteswap()
+
+    pages = names.split("\n") if count else []
+    return LinkGraph(pages, start, links)
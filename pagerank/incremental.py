@@ -0,0 +1,187 @@
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+
+from graph import link_graph, load_graph, save_graph
+from pagerank import TOLERANCE, power_iteration
+
+# Rank store layout: magic, damping factor, base residual, page count, ranks.
+# The graph the ranks belong to is saved next to it with save_graph.
+RANKS_MAGIC = b"PRRANKS1"
+RANKS_HEADER = struct.Struct("<8sddQ")
+
+# Beyond this share of changed pages, a warm-started power iteration wins
+PUSH_LIMIT = 0.1
+
+
+def incremental_pagerank(corpus, damping_factor, store, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page like `iterate_pagerank`,
+    updating the ranks saved in `store` by the previous run rather than
+    starting from uniform ranks, and saving the new ones there.
+
+    Small edits are absorbed by pushing residuals out from the pages
+    whose links changed, so only their neighborhood is touched. Larger
+    edits warm-start a power iteration from the saved ranks instead.
+    """
+    graph = link_graph(corpus)
+    saved = load_ranks(store)
+
+    if saved is None or saved[2] != damping_factor:
+        ranks, _ = power_iteration(graph, damping_factor, tolerance)
+    else:
+        old_graph, old_ranks, _, base = saved
+        changed = changed_pages(old_graph, graph)
+        if len(changed) > PUSH_LIMIT * max(graph.page_count(), 1):
+            ranks, _ = power_iteration(
+                graph, damping_factor, tolerance,
+                ranks=carried_ranks(old_graph, old_ranks, graph)
+            )
+        else:
+            ranks = push_update(
+                old_graph, old_ranks, base, graph, changed, damping_factor, tolerance
+            )
+
+    save_ranks(store, graph, ranks, damping_factor)
+    return dict(zip(graph.pages, ranks))
+
+
+def changed_pages(old_graph, graph):
+    """
+    Returns the names of pages whose links differ between the two graphs,
+    including pages that were added or removed.
+    """
+    old_index = {page: i for i, page in enumerate(old_graph.pages)}
+    index = {page: i for i, page in enumerate(graph.pages)}
+
+    changed = set(old_index) ^ set(index)
+    for page in set(old_index) & set(index):
+        old_links = {old_graph.pages[link] for link in old_graph.outlinks(old_index[page])}
+        links = {graph.pages[link] for link in graph.outlinks(index[page])}
+        if old_links != links:
+            changed.add(page)
+    return changed
+
+
+def carried_ranks(old_graph, old_ranks, graph):
+    """
+    Returns the saved rank of every page in `graph`, 0 for new pages.
+    """
+    old_index = {page: i for i, page in enumerate(old_graph.pages)}
+    return [
+        old_ranks[old_index[page]] if page in old_index else 0
+        for page in graph.pages
+    ]
+
+
+def push_update(old_graph, old_ranks, base, graph, changed, damping_factor, tolerance):
+    """
+    Repair converged `old_ranks` for `graph` by residual propagation.
+
+    The residual of the saved ranks under the new links is nonzero only
+    around changed pages, apart from a part shared equally by every page.
+    Pushing the local part to convergence leaves ranks proportional to
+    the true PageRank, because PageRank itself answers a residual shared
+    by every page, so normalizing at the end accounts for the shared part.
+    """
+    N = graph.page_count()
+    old_index = {page: i for i, page in enumerate(old_graph.pages)}
+    index = {page: i for i, page in enumerate(graph.pages)}
+    ranks = carried_ranks(old_graph, old_ranks, graph)
+
+    # Moves the mass each changed page sent along its old links to its new ones
+    residuals = {}
+    for page in changed:
+        if page in old_index:
+            old = old_index[page]
+            mass = damping_factor * old_ranks[old]
+            for link in old_graph.outlinks(old):
+                target = index.get(old_graph.pages[link])
+                if target is not None:
+                    share = mass / old_graph.out_degree(old)
+                    residuals[target] = residuals.get(target, 0) - share
+            if page in index:
+                new = index[page]
+                for link in graph.outlinks(new):
+                    share = mass / graph.out_degree(new)
+                    residuals[link] = residuals.get(link, 0) + share
+        else:
+            # A new page starts from nothing, so it is owed the old base rank
+            new = index[page]
+            residuals[new] = residuals.get(new, 0) + base
+
+    threshold = tolerance / max(N, 1)
+    queue = deque(page for page, residual in residuals.items() if abs(residual) > threshold)
+    while queue:
+        page = queue.popleft()
+        residual = residuals.pop(page, 0)
+        if abs(residual) <= threshold:
+            continue
+        ranks[page] += residual
+
+        # Dangling pages spread to everyone, which normalizing covers
+        degree = graph.out_degree(page)
+        if degree == 0:
+            continue
+        share = damping_factor * residual / degree
+        for link in graph.outlinks(page):
+            before = residuals.get(link, 0)
+            residuals[link] = before + share
+            if abs(before) <= threshold < abs(before + share):
+                queue.append(link)
+
+    total = sum(ranks)
+    return [rank / total for rank in ranks]
+
+
+def base_residual(graph, ranks, damping_factor):
+    """
+    Returns the part of every page's rank that does not come from a
+    specific link: the random jump plus its share of dangling pages.
+    """
+    N = graph.page_count()
+    dangling = sum(
+        rank for page, rank in enumerate(ranks) if graph.out_degree(page) == 0
+    )
+    return (1 - damping_factor) / N + damping_factor * dangling / N
+
+
+def save_ranks(store, graph, ranks, damping_factor):
+    """
+    Write `ranks` for `graph` to the rank store at path `store`.
+    """
+    save_graph(graph, f"{store}.graph")
+    values = array("d", ranks)
+    if sys.byteorder != "little":
+        values.byteswap()
+
+    temporary = f"{store}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(RANKS_HEADER.pack(
+            RANKS_MAGIC, damping_factor,
+            base_residual(graph, ranks, damping_factor), len(values)
+        ))
+        values.tofile(f)
+    os.replace(temporary, store)
+
+
+def load_ranks(store):
+    """
+    Returns the graph, ranks, damping factor and base residual saved
+    at `store`, or None if nothing has been saved there yet.
+    """
+    if not os.path.exists(store) or not os.path.exists(f"{store}.graph"):
+        return None
+    with open(store, "rb") as f:
+        magic, damping_factor, base, count = RANKS_HEADER.unpack(
+            f.read(RANKS_HEADER.size)
+        )
+        if magic != RANKS_MAGIC:
+            raise ValueError(f"{store} is not a rank store")
+        ranks = array("d")
+        ranks.fromfile(f, count)
+    if sys.byteorder != "little":
+        ranks.byteswap()
+    return load_graph(f"{store}.graph"), ranks, damping_factor, base
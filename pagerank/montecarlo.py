@@ -0,0 +1,97 @@
+import math
+import random
+from multiprocessing import Pool
+
+from graph import link_graph
+from pagerank import surf
+
+# Chains run side by side, and how many more steps each takes per round
+CHAINS = 8
+ROUND_STEPS = 10000
+
+# LinkGraph held by each worker process
+worker_graph = None
+
+
+def multichain_pagerank(corpus, damping_factor, epsilon=None, chains=CHAINS,
+                        steps=ROUND_STEPS, max_samples=None, processes=None, seed=0):
+    """
+    Estimate PageRank with `chains` independent random surfers spread
+    over a pool of `processes` workers.
+
+    Every round walks each chain `steps` further and merges the visit
+    counts. With `epsilon`, rounds repeat until every page's standard
+    error is below `epsilon` or `max_samples` samples have been taken;
+    without it, one round is run. Each chain has its own RNG seeded from
+    `seed`, so results do not depend on the number of processes.
+
+    Returns two dictionaries keyed by page: the PageRank estimates and
+    their standard errors.
+    """
+    if chains < 2:
+        raise ValueError("standard errors need at least two chains")
+
+    graph = link_graph(corpus)
+    states = [
+        (random.Random(f"{seed}-{chain}").getstate(), None)
+        for chain in range(chains)
+    ]
+    totals = [[0] * graph.page_count() for _ in range(chains)]
+    taken = 0
+
+    with Pool(processes, initializer=attach_graph, initargs=(graph,)) as pool:
+        while True:
+            results = pool.map(
+                walk_chain,
+                [(damping_factor, steps, state, page) for state, page in states]
+            )
+            states = []
+            for chain, (counts, state, page) in enumerate(results):
+                totals[chain] = [a + b for a, b in zip(totals[chain], counts)]
+                states.append((state, page))
+            taken += chains * steps
+
+            ranks, errors = chain_estimates(totals, taken // chains)
+            if epsilon is None or max(errors) < epsilon:
+                break
+            if max_samples is not None and taken >= max_samples:
+                break
+
+    return dict(zip(graph.pages, ranks)), dict(zip(graph.pages, errors))
+
+
+def attach_graph(graph):
+    global worker_graph
+    worker_graph = graph
+
+
+def walk_chain(task):
+    """
+    Continues one chain from its saved RNG state and page, returning
+    the new visit counts and the state to resume from next round.
+    """
+    damping_factor, steps, state, page = task
+    rng = random.Random()
+    rng.setstate(state)
+    counts, page = surf(worker_graph, damping_factor, steps, rng, page)
+    return counts, rng.getstate(), page
+
+
+def chain_estimates(totals, samples):
+    """
+    Returns the mean visit frequency of each page over the chains, and
+    its standard error from the spread between chains.
+
+    Comparing whole chains rather than single steps keeps the error
+    honest even though steps within a chain are correlated.
+    """
+    chains = len(totals)
+    ranks = []
+    errors = []
+    for counts in zip(*totals):
+        frequencies = [count / samples for count in counts]
+        mean = sum(frequencies) / chains
+        variance = sum((f - mean) ** 2 for f in frequencies) / (chains - 1)
+        ranks.append(mean)
+        errors.append(math.sqrt(variance / chains))
+    return ranks, errors
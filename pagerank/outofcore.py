@@ -0,0 +1,163 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from pagerank import TOLERANCE, MAX_ITERATIONS
+
+# Edge file layout: magic, page count, edge count, then (source, target)
+# uint32 pairs sorted by source. Page names are kept in a separate file.
+EDGES_MAGIC = b"PREDGES1"
+EDGES_HEADER = struct.Struct("<8sQQ")
+
+# Edges read from the file at a time
+BLOCK_EDGES = 1 << 20
+
+
+def save_edges(graph, path):
+    """
+    Write the links of a LinkGraph to an edge file at `path`, and its
+    page names to `path`.pages.
+    """
+    write_edges(
+        path, graph.pages,
+        ((page, link) for page in range(graph.page_count())
+         for link in graph.outlinks(page))
+    )
+
+
+def write_edges(path, pages, edges):
+    """
+    Write an edge file at `path` from (source, target) index pairs,
+    which must come sorted by source, and the `pages` they index to
+    `path`.pages. Edges are written as they arrive, so they need not
+    fit in memory.
+    """
+    with open(f"{path}.pages", "w", encoding="utf-8") as f:
+        count = 0
+        for page in pages:
+            f.write(f"{page}\n")
+            count += 1
+
+    with open(path, "wb") as f:
+        f.write(EDGES_HEADER.pack(EDGES_MAGIC, count, 0))
+        written = 0
+        previous = 0
+        block = array("I")
+        for source, target in edges:
+            if source < previous:
+                raise ValueError("edges must be sorted by source")
+            previous = source
+            block.append(source)
+            block.append(target)
+            if len(block) >= 2 * BLOCK_EDGES:
+                written += flush_block(f, block)
+        written += flush_block(f, block)
+
+        f.seek(0)
+        f.write(EDGES_HEADER.pack(EDGES_MAGIC, count, written))
+
+
+def flush_block(f, block):
+    """
+    Appends a block of edges to `f` in little-endian order and empties
+    it, returning the number of edges written.
+    """
+    if sys.byteorder != "little":
+        block.byteswap()
+    block.tofile(f)
+    written = len(block) // 2
+    del block[:]
+    return written
+
+
+def page_names(path):
+    """
+    Returns the page names of the edge file at `path`, in index order.
+    """
+    with open(f"{path}.pages", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+def edge_file_pagerank(path, damping_factor, tolerance=TOLERANCE,
+                       max_iterations=MAX_ITERATIONS, block_edges=BLOCK_EDGES,
+                       dtype="float64"):
+    """
+    Run power iteration like `power_iteration` over the edge file at
+    `path` without loading it, and return a NumPy array of ranks in
+    page order along with the number of rounds run.
+
+    Each round reads the memory-mapped edges `block_edges` at a time,
+    so only rank vectors of `dtype` (float32 or float64) and one block
+    are held in memory. Because edges are sorted by source, a page's
+    out-degree is the length of its run, and runs are never split
+    between blocks.
+
+    Requires NumPy.
+    """
+    import numpy
+
+    with open(path, "rb") as f:
+        magic, N, count = EDGES_HEADER.unpack(f.read(EDGES_HEADER.size))
+        if magic != EDGES_MAGIC:
+            raise ValueError(f"{path} is not an edge file")
+        if count == 0:
+            return numpy.full(N, 1 / N, dtype=dtype), 1
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    edges = numpy.frombuffer(
+        mapped, dtype="<u4", count=2 * count, offset=EDGES_HEADER.size
+    ).reshape(count, 2)
+    ranks = numpy.full(N, 1 / N, dtype=dtype)
+
+    # Rounding in float32 can keep the change between rounds from falling
+    # much below machine epsilon, so a smaller tolerance may never be met
+    tolerance = max(tolerance, float(numpy.finfo(dtype).eps))
+
+    iterations = 0
+    previous_change = float("inf")
+    while iterations < max_iterations:
+        iterations += 1
+        new_ranks = numpy.zeros(N, dtype=dtype)
+        linked = 0.0
+
+        begin = 0
+        previous = -1
+        while begin < count:
+            # Extends the block to the end of its last source's run
+            end = min(begin + block_edges, count)
+            if end < count:
+                end = int(numpy.searchsorted(
+                    edges[:, 0], edges[end - 1, 0], side="right"
+                ))
+            sources = edges[begin:end, 0].astype(numpy.int64)
+            targets = edges[begin:end, 1]
+
+            starts = numpy.flatnonzero(numpy.diff(sources, prepend=previous))
+            if (numpy.diff(sources[starts], prepend=previous) <= 0).any():
+                raise ValueError(f"{path} is not sorted by source")
+            degree = numpy.diff(starts, append=len(sources))
+            run_ranks = ranks[sources[starts]].astype(numpy.float64)
+            linked += run_ranks.sum()
+
+            # Each page splits its rank evenly over its links
+            share = numpy.repeat(run_ranks / degree, degree)
+            numpy.add.at(new_ranks, targets, share.astype(dtype))
+            previous = sources[-1]
+            begin = end
+
+        # Pages with no links spread their rank over every page
+        dangling = float(ranks.sum(dtype=numpy.float64)) - linked
+        new_ranks += dangling / N
+        new_ranks = ((1 - damping_factor) / N + damping_factor * new_ranks).astype(dtype)
+
+        change = float(numpy.abs(new_ranks.astype(numpy.float64) - ranks).sum())
+        ranks = new_ranks
+
+        # Each round shrinks the change, unless rounding has taken over
+        if change < tolerance or change >= previous_change:
+            break
+        previous_change = change
+
+    ranks /= ranks.sum(dtype=numpy.float64)
+    return ranks, iterations
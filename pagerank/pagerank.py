@@ -1,16 +1,37 @@
+import argparse
 import os
 import random
 import re
-import sys
+
+from crawler import crawl_graph
+from graph import link_graph, load_graph, save_graph
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Random surfers walked side by side by vectorized_sample_pagerank
+SURFERS = 1000
+
+# L1 change between rounds at which iterate_pagerank stops
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus",
+                        help="directory of HTML pages, or a graph saved with --save")
+    parser.add_argument("--save", metavar="FILE",
+                        help="save the crawled link graph to FILE for reuse")
+    args = parser.parse_args()
+
+    if os.path.isfile(args.corpus):
+        corpus = load_graph(args.corpus)
+    else:
+        corpus = crawl_graph(args.corpus)
+    if args.save:
+        save_graph(corpus, args.save)
+
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -88,96 +109,198 @@ def sample_pagerank(corpus, damping_factor, n):
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
-    PageRank values should sum to 1.
+    PageRank values should sum to 1. `corpus` may also be a LinkGraph.
     """
-    rank = {}
-    
-    # creates dict to count samples
-    samples = {}
+    graph = link_graph(corpus)
+    counts, _ = surf(graph, damping_factor, n, random.Random())
+    return {page: count / n for page, count in zip(graph.pages, counts)}
+
+
+def surf(graph, damping_factor, n, rng, page=None):
+    """
+    Walk `n` steps of the random surfer over a LinkGraph from `page`
+    (a random page if None), and return how often each page was
+    visited along with the page the surfer ended on.
+
+    Each step is O(1): a biased coin picks between following one of
+    the current page's links and jumping to any page, which draws from
+    exactly the distribution `transition_model` describes.
+    """
+    N = graph.page_count()
+    start = graph.start
+    links = graph.links
+    counts = [0] * N
+    if page is None:
+        page = rng.randrange(N)
+
+    for _ in range(n):
+        degree = start[page + 1] - start[page]
+        if degree and rng.random() < damping_factor:
+            page = links[start[page] + int(rng.random() * degree)]
+        else:
+            page = int(rng.random() * N)
+        counts[page] += 1
 
-    # picks a random page to start
-    sample = str(random.choice(list(corpus.keys())))
+    return counts, page
 
-    # loops through pages according to page probabilities:)
-    for page in range(n):
-        distribution = transition_model(corpus, sample, damping_factor)
-        keys = list(distribution.keys())
-        weights = list(distribution.values())
-        sample = random.choices((keys), weights = weights)[0]
-        samples[sample] = samples.get(sample, 0) + 1
 
-    # converts to estimated PageRank (times visited/total)
-    for sample in samples:
-        samples[sample] = samples[sample]/n 
+def vectorized_sample_pagerank(corpus, damping_factor, n, surfers=SURFERS, seed=None):
+    """
+    Return PageRank values estimated from `n` samples like
+    `sample_pagerank`, taken by `surfers` independent random surfers
+    walking in lockstep as NumPy arrays.
+
+    Each surfer starts on a random page and keeps following links with
+    probability `damping_factor`, and the page its walk ends on is one
+    sample, after which it starts again. That page is drawn exactly from
+    the PageRank distribution however short the walk, so no steps are
+    needed to forget the starting page. The price is about
+    1 / (1 - `damping_factor`) steps per sample, where counting every
+    step would take one but bias the estimate towards the random starts
+    unless each surfer walked far longer than that.
+
+    Requires NumPy.
+    """
+    import numpy
+
+    if damping_factor >= 1:
+        raise ValueError("walks only end with a damping_factor below 1")
+
+    graph = link_graph(corpus)
+    N = graph.page_count()
+    start = numpy.frombuffer(graph.start, dtype=numpy.uint32).astype(numpy.int64)
+    links = numpy.frombuffer(graph.links, dtype=numpy.uint32).astype(numpy.int64)
+    degree = numpy.diff(start)
+
+    rng = numpy.random.default_rng(seed)
+    surfers = max(1, min(surfers, n))
+    pages = rng.integers(N, size=surfers)
+    counts = numpy.zeros(N, dtype=numpy.int64)
 
-    return samples
+    # Every surfer ends a set number of walks, so stopping after `n`
+    # samples does not leave out the walks that happen to run long
+    walks = numpy.full(surfers, n // surfers)
+    walks[:n % surfers] += 1
+    walking = numpy.arange(surfers)
 
+    while len(walking):
+        current = pages[walking]
 
-def iterate_pagerank(corpus, damping_factor):
+        # Walks end where the coin says jump, each giving one sample
+        ending = rng.random(len(walking)) >= damping_factor
+        numpy.add.at(counts, current[ending], 1)
+        walks[walking[ending]] -= 1
+
+        # The rest follow a link where there is one to follow, and
+        # every other surfer starts a new walk on a random page
+        follow = ~ending & (degree[current] > 0)
+        offsets = (rng.random(len(walking)) * degree[current]).astype(numpy.int64)
+        next_pages = rng.integers(N, size=len(walking))
+        next_pages[follow] = links[(start[current] + offsets)[follow]]
+        pages[walking] = next_pages
+        walking = walking[walks[walking] > 0]
+
+    return {page: count / n for page, count in zip(graph.pages, counts.tolist())}
+
+
+def iterate_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
-    PageRank values should sum to 1.
-    """  
-    
-    # assigns each page a starting rank of 1/(# of pages in corpus)
-    ranks = {}
-    N = len(corpus)
-    for page in corpus:
-        ranks[page] = 1/N
-    
-    # calculates number of links on each page
-    links = {}
-    for page in corpus:
-        if len(corpus[page]) == 0:
-            links[page] = len(corpus)
-        else:
-            links[page] = len(corpus[page])
-
-    # creates a dict to keep track of if PageRank values are accurate enough
-    accuracy = {}
-    for page in corpus:
-        accuracy[page] = False
-    counter = 0
-    accurate = False
-
-    # recusrivly calclutates new ranks 
-    while not accurate:
-
-        # caluates new rank
-        sum_other_pages = 0
-        current_page = str(random.choice(list(corpus.keys())))
-        for page in corpus:
-            if page != current_page and current_page in corpus[page]:
-                sum_other_pages += ranks[page]/links[page]
-        new_rank = (1-damping_factor)/N + damping_factor*sum_other_pages
-
-        # returns ranks once each rank is accurate to within 0.001
-        if abs(new_rank - ranks[current_page]) < 0.001:
-            accuracy[current_page] = True
-        else:
-            accuracy[current_page] = False
-        if all(page == True for page in accuracy.values()):
-            counter += 1 
-            if counter > 100:
-                accurate = True
-        else:
-            accurate = False
-            counter = 0
-
-        ranks[current_page] = new_rank
-
-    # normalizes PageRanks to add up to 1
-    total = 0
-    for rank in ranks:
-        total += ranks[rank]
-    a = 1/total
-    for rank in ranks:
-        ranks[rank] *= a
-    return ranks
+    PageRank values should sum to 1. `corpus` may also be a LinkGraph.
+    """
+    graph = link_graph(corpus)
+    ranks, _ = power_iteration(graph, damping_factor, tolerance)
+    return dict(zip(graph.pages, ranks))
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, ranks=None):
+    """
+    Run synchronous PageRank updates over a LinkGraph, starting from
+    `ranks` (uniform if None), until the L1 change between two rounds
+    drops below `tolerance`.
+
+    A page with no links counts as linking to every page, itself included.
+    Uses NumPy when it is installed. Returns the list of ranks and the
+    number of rounds run.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return python_power_iteration(
+            graph, damping_factor, tolerance, max_iterations, ranks
+        )
+
+    N = graph.page_count()
+    start = numpy.frombuffer(graph.start, dtype=numpy.uint32).astype(numpy.int64)
+    links = numpy.frombuffer(graph.links, dtype=numpy.uint32)
+    degree = numpy.diff(start)
+    dangling = degree == 0
+    sources = numpy.repeat(numpy.arange(N), degree)
+
+    if ranks is None:
+        ranks = numpy.full(N, 1 / N)
+    else:
+        ranks = numpy.array(ranks, dtype=numpy.float64)
+
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+
+        # Each page splits its rank evenly over its links
+        share = numpy.where(dangling, 0, ranks / numpy.maximum(degree, 1))
+        new_ranks = numpy.bincount(links, weights=share[sources], minlength=N)
+        new_ranks = new_ranks + ranks[dangling].sum() / N
+        new_ranks = (1 - damping_factor) / N + damping_factor * new_ranks
+
+        change = numpy.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    ranks /= ranks.sum()
+    return ranks.tolist(), iterations
+
+
+def python_power_iteration(graph, damping_factor, tolerance, max_iterations, ranks):
+    """
+    Same as `power_iteration`, in plain Python.
+    """
+    N = graph.page_count()
+    if ranks is None:
+        ranks = [1 / N] * N
+    else:
+        ranks = list(ranks)
+
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+
+        dangling = 0
+        new_ranks = [0] * N
+        for page in range(N):
+            degree = graph.out_degree(page)
+            if degree == 0:
+                dangling += ranks[page]
+                continue
+            share = ranks[page] / degree
+            for link in graph.outlinks(page):
+                new_ranks[link] += share
+
+        base = (1 - damping_factor) / N + damping_factor * dangling / N
+        new_ranks = [base + damping_factor * rank for rank in new_ranks]
+
+        change = sum(abs(new - old) for new, old in zip(new_ranks, ranks))
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    total = sum(ranks)
+    return [rank / total for rank in ranks], iterations
 
 if __name__ == "__main__":
     main()
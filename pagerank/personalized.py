@@ -0,0 +1,126 @@
+import math
+import random
+from collections import deque
+
+from pagerank import DAMPING
+
+# Residual per link below which forward push stops pushing a page
+EPSILON = 1e-4
+
+
+def personalized_pagerank(corpus, seeds, damping_factor=DAMPING, epsilon=EPSILON,
+                          walks=0, seed=None):
+    """
+    Return PageRank values personalized to `seeds` for a corpus
+    dictionary as returned by `crawl`, along with a bound on their error.
+
+    The surfer follows a random link with probability `damping_factor`
+    and otherwise jumps back to a seed page, as it also does from pages
+    with no links. `seeds` is a collection of pages, or a dictionary
+    weighting them.
+
+    Forward push stops once no page holds more than `epsilon` residual
+    per link, which costs time proportional to 1 / `epsilon` however
+    large the corpus is. The dictionary returned holds only pages that
+    were reached, and the bound is the rank not yet placed, which is at
+    least the L1 distance to the exact values. With `walks`, that rank
+    is then placed by about as many random walks, which leaves the
+    estimate unbiased with its error expected to shrink as the bound
+    over the square root of `walks`.
+    """
+    teleport = seed_distribution(corpus, seeds)
+    ranks, residuals = forward_push(corpus, teleport, damping_factor, epsilon)
+    bound = sum(residuals.values())
+
+    if walks and bound > 0:
+        rng = random.Random(seed)
+        targets = list(teleport)
+        weights = [teleport[page] for page in targets]
+        ordered = {}
+        for page, residual in residuals.items():
+            # Each page gets walks in proportion to the residual it holds
+            count = math.ceil(residual / bound * walks)
+            for _ in range(count):
+                end = random_walk(
+                    corpus, page, damping_factor, targets, weights, rng, ordered
+                )
+                ranks[end] = ranks.get(end, 0) + residual / count
+
+    return ranks, bound
+
+
+def seed_distribution(corpus, seeds):
+    """
+    Returns a dictionary mapping each seed page to the probability of
+    jumping to it.
+    """
+    if not isinstance(seeds, dict):
+        seeds = {page: 1 for page in seeds}
+    for page in seeds:
+        if page not in corpus:
+            raise ValueError(f"seed {page} is not in the corpus")
+    total = sum(seeds.values())
+    if total <= 0:
+        raise ValueError("seeds need a positive total weight")
+    return {page: weight / total for page, weight in seeds.items() if weight}
+
+
+def forward_push(corpus, teleport, damping_factor, epsilon):
+    """
+    Runs forward push from the `teleport` distribution, returning
+    dictionaries of rank placed on each page and residual still held.
+
+    Every page's exact rank is its placed rank plus the personalized
+    rank it would receive from each page's residual, so the total
+    residual bounds the error. Each push places at least
+    (1 - `damping_factor`) * `epsilon` rank, which caps the work.
+    """
+    ranks = {}
+    residuals = dict(teleport)
+    queue = deque(residuals)
+    queued = set(queue)
+
+    while queue:
+        page = queue.popleft()
+        queued.discard(page)
+        residual = residuals.get(page, 0)
+        links = corpus[page]
+        if residual <= epsilon * max(len(links), 1):
+            continue
+
+        ranks[page] = ranks.get(page, 0) + (1 - damping_factor) * residual
+        residuals[page] = 0
+
+        # Pages with no links send the surfer back to the seeds
+        if links:
+            targets = [(link, damping_factor * residual / len(links)) for link in links]
+        else:
+            targets = [(link, damping_factor * residual * weight)
+                       for link, weight in teleport.items()]
+        for link, share in targets:
+            residuals[link] = residuals.get(link, 0) + share
+            if link not in queued and residuals[link] > epsilon * max(len(corpus[link]), 1):
+                queue.append(link)
+                queued.add(link)
+
+    return ranks, {page: residual for page, residual in residuals.items() if residual}
+
+
+def random_walk(corpus, page, damping_factor, seeds, weights, rng, ordered):
+    """
+    Walks the personalized surfer from `page` until it stops, which it
+    does with probability 1 - `damping_factor` at each page, and
+    returns the page it stopped on.
+
+    `ordered` caches each page's links in sorted order, so that a
+    seeded `rng` walks the same way every run.
+    """
+    while rng.random() < damping_factor:
+        links = ordered.get(page)
+        if links is None:
+            links = ordered[page] = sorted(corpus[page])
+        if links:
+            page = rng.choice(links)
+        else:
+            page = rng.choices(seeds, weights)[0]
+    return page